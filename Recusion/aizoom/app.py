@@ -1,109 +1,317 @@
-import cv2
-import numpy as np
-import uuid
-from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import FileResponse
-import shutil
-import os
-
-from fastapi.middleware.cors import CORSMiddleware
-
-app = FastAPI()
-
-# Allow all origins for testing; you can restrict this for production
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allow all origins (or specify domains)
-    allow_credentials=True,
-    allow_methods=["*"],  # Allow all HTTP methods
-    allow_headers=["*"],  # Allow all headers
-)
-
-
-UPLOAD_DIR = "uploads"
-OUTPUT_DIR = "processed"
-
-# Ensure directories exist
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-@app.post("/process-video/")
-async def process_video(file: UploadFile = File(...)):
-    # Save uploaded file
-    input_video_path = f"{UPLOAD_DIR}/{uuid.uuid4()}.mp4"
-    with open(input_video_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Process the video
-    output_video_path = f"{OUTPUT_DIR}/{uuid.uuid4()}_output.mp4"
-    process_zoom_tracking(input_video_path, output_video_path)
-
-    # Return the processed video
-    return FileResponse(output_video_path, media_type="video/mp4")
-
-def process_zoom_tracking(input_video_path, output_video_path):
-    cap = cv2.VideoCapture(input_video_path)
-
-    if not cap.isOpened():
-        print("Error: Could not open video.")
-        return
-
-    ret, frame = cap.read()
-    if not ret:
-        print("Error: Couldn't read the video frame.")
-        return
-
-    frame_h, frame_w = frame.shape[:2]
-    zoomed_h = frame_h
-    zoomed_w = int(frame_h * (9 / 16))  # Convert to 16:9 ratio
-
-    bbox = cv2.selectROI("Select Object to Track", frame, fromCenter=False, showCrosshair=True)
-    cv2.destroyAllWindows()
-
-    tracker = cv2.legacy.TrackerCSRT_create()
-    tracker.init(frame, bbox)
-
-    zoom_factor = 1.4
-    smooth_x, smooth_y = bbox[0], bbox[1]
-
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(output_video_path, fourcc, 30.0, (zoomed_w, zoomed_h))
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        success, bbox = tracker.update(frame)
-
-        if success:
-            x, y, w, h = [int(v) for v in bbox]
-            smooth_x = int(0.8 * smooth_x + 0.2 * x)
-            smooth_y = int(0.8 * smooth_y + 0.2 * y)
-            obj_center_x = smooth_x + w // 2
-            obj_center_y = smooth_y + h // 2
-        else:
-            obj_center_x = frame_w // 2
-            obj_center_y = frame_h // 2
-            smooth_x = int(0.9 * smooth_x + 0.1 * obj_center_x)
-            smooth_y = int(0.9 * smooth_y + 0.1 * obj_center_y)
-
-        zoom_w_scaled = int(zoomed_w / zoom_factor)
-        zoom_h_scaled = int(zoomed_h / zoom_factor)
-
-        x1 = max(0, obj_center_x - zoom_w_scaled // 2)
-        y1 = max(0, obj_center_y - zoom_h_scaled // 2)
-        x2 = min(frame_w, obj_center_x + zoom_w_scaled // 2)
-        y2 = min(frame_h, obj_center_y + zoom_h_scaled // 2)
-
-        cropped = frame[y1:y2, x1:x2]
-        zoomed_frame = cv2.resize(cropped, (zoomed_w, zoomed_h), interpolation=cv2.INTER_LINEAR)
-
-        out.write(zoomed_frame)
-
-    cap.release()
-    out.release()
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+import uuid
+import asyncio
+import multiprocessing
+import time
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+import shutil
+import os
+
+from fastapi.middleware.cors import CORSMiddleware
+
+from camera_path import (ENCODER_CRF, ENCODER_PRESET, REDETECT_AFTER, X264_PRESETS, analyse_camera_path, load_track,
+                         render_camera_path, save_track)
+from detection import DETECTORS
+from tracking import DEFAULT_TRACKER, TRACK_WIDTH, TRACKERS
+
+app = FastAPI()
+
+# Allow all origins for testing; you can restrict this for production
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Allow all origins (or specify domains)
+    allow_credentials=True,
+    allow_methods=["*"],  # Allow all HTTP methods
+    allow_headers=["*"],  # Allow all headers
+)
+
+
+UPLOAD_DIR = "uploads"
+OUTPUT_DIR = "processed"
+
+# Videos tracked at the same time, each in its own worker process
+MAX_WORKERS = int(os.environ.get("AIZOOM_WORKERS", os.cpu_count() or 2))
+
+# Output shape: width:height of the crop, and how far it zooms in on the subject
+DEFAULT_ASPECT = "9:16"
+DEFAULT_ZOOM = 1.4
+MAX_ZOOM = 4.0
+
+# Ensure directories exist
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+# Tracking jobs of this server: id -> status record (kept in memory, lost on restart)
+jobs = {}
+_pool = None
+
+
+def get_pool():
+    """Worker processes for tracking, created on first use (spawned, so no OpenCV state is forked)."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+@app.on_event("shutdown")
+def shutdown_pool():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_numbers(value, count, name):
+    """Parse "a,b,..." into exactly `count` integers, or raise a 422."""
+    try:
+        numbers = [int(float(part)) for part in value.split(",")]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count:
+        raise HTTPException(status_code=422, detail=f"{name} must be {count} comma-separated numbers")
+    return numbers
+
+
+def parse_options(tracker, track_every):
+    """Tracker engine and tracking interval of a request."""
+    if tracker not in TRACKERS:
+        raise HTTPException(status_code=422, detail=f"tracker must be one of {list(TRACKERS)}")
+    if track_every < 1:
+        raise HTTPException(status_code=422, detail="track_every must be at least 1")
+    return {"tracker_engine": tracker, "track_every": track_every}
+
+
+def parse_framing(aspect, zoom):
+    """Output aspect ratio ("w:h") and zoom factor of a request."""
+    try:
+        width, height = (float(part) for part in aspect.split(":"))
+    except ValueError:
+        width = height = 0
+    if width <= 0 or height <= 0:
+        raise HTTPException(status_code=422, detail='aspect must look like "9:16"')
+    if not 1.0 <= zoom <= MAX_ZOOM:
+        raise HTTPException(status_code=422, detail=f"zoom must be between 1 and {MAX_ZOOM}")
+    return {"aspect": width / height, "zoom_factor": zoom}
+
+
+def parse_encoding(preset, crf):
+    """H.264 encoder preset and CRF of a request."""
+    if preset not in X264_PRESETS:
+        raise HTTPException(status_code=422, detail=f"preset must be one of {list(X264_PRESETS)}")
+    if not 0 <= crf <= 51:
+        raise HTTPException(status_code=422, detail="crf must be between 0 and 51")
+    return {"preset": preset, "crf": crf}
+
+
+def parse_roi(bbox, point, detector="auto"):
+    """
+    Read how to find the subject from the request: a bbox "x,y,w,h", a click
+    point "x,y", or else the detector that looks for it.
+    """
+    if detector != "auto" and detector not in DETECTORS:
+        raise HTTPException(status_code=422, detail=f"detector must be one of {['auto', *DETECTORS]}")
+    if bbox and point:
+        raise HTTPException(status_code=422, detail="Give either bbox or point, not both")
+    if bbox:
+        x, y, w, h = parse_numbers(bbox, 4, "bbox")
+        if w <= 0 or h <= 0 or x < 0 or y < 0:
+            raise HTTPException(status_code=422, detail="bbox needs x, y >= 0 and a positive width and height")
+        return {"bbox": (x, y, w, h), "detector": detector}
+    if point:
+        x, y = parse_numbers(point, 2, "point")
+        if x < 0 or y < 0:
+            raise HTTPException(status_code=422, detail="point must be inside the frame")
+        return {"point": (x, y), "detector": detector}
+    return {"detector": detector}
+
+
+async def save_upload(file):
+    input_video_path = f"{UPLOAD_DIR}/{uuid.uuid4()}.mp4"
+
+    def copy():
+        with open(input_video_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+
+    # Blocking disk I/O stays off the event loop
+    await run_in_threadpool(copy)
+    return input_video_path
+
+
+def submit_job(task, input_video_path, track_path=None, **fields):
+    """
+    Queue task(input_video_path, output_video_path, track_path=...) on the
+    process pool and record it as a job. Without a track_path the job gets
+    its own, for the camera path its analysis pass writes.
+    """
+    job_id = str(uuid.uuid4())
+    output_video_path = f"{OUTPUT_DIR}/{job_id}_output.mp4"
+    jobs[job_id] = {
+        "id": job_id,
+        "status": "processing",
+        "created_at": time.time(),
+        "finished_at": None,
+        "error": None,
+        **fields,
+        "input_path": input_video_path,
+        "output_path": output_video_path,
+        "track_path": track_path or f"{OUTPUT_DIR}/{job_id}_track.npy"
+    }
+
+    future = asyncio.get_running_loop().run_in_executor(get_pool(), functools.partial(
+        task, input_video_path, output_video_path, track_path=jobs[job_id]["track_path"]
+    ))
+
+    def on_done(done):
+        job = jobs[job_id]
+        job["finished_at"] = time.time()
+        if done.cancelled():
+            job["status"], job["error"] = "failed", "Cancelled"
+        elif done.exception() is not None:
+            job["status"], job["error"] = "failed", str(done.exception())
+        else:
+            job["status"] = "complete"
+
+    future.add_done_callback(on_done)
+    return job_id, future
+
+
+def public_job(job):
+    return {key: value for key, value in job.items() if not key.endswith("_path")}
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...), bbox: Optional[str] = Form(None),
+                     point: Optional[str] = Form(None), detector: str = Form("auto"),
+                     tracker: str = Form(DEFAULT_TRACKER), track_every: int = Form(1),
+                     aspect: str = Form(DEFAULT_ASPECT), zoom: float = Form(DEFAULT_ZOOM),
+                     preset: str = Form(ENCODER_PRESET), crf: int = Form(ENCODER_CRF)):
+    """
+    Submit a video for zoom tracking and return at once.
+
+    The subject is given as bbox="x,y,w,h" or point="x,y" (pixels of the
+    first frame); without either it is detected automatically (detector=
+    auto, face, person or saliency). The detector also finds the subject
+    again when tracking is lost. tracker picks the engine (csrt, kcf, mosse,
+    flow) and track_every=N tracks every Nth frame only; aspect ("w:h") and
+    zoom shape the output, which is H.264 (x264 preset and crf) at the
+    source frame rate with the source audio. Poll GET /jobs/{id} and fetch the result from
+    GET /jobs/{id}/output; POST /jobs/{id}/render re-renders the tracked
+    camera path with another aspect or zoom.
+    """
+    task = functools.partial(process_zoom_tracking, **parse_roi(bbox, point, detector),
+                             **parse_options(tracker, track_every), **parse_framing(aspect, zoom),
+                             **parse_encoding(preset, crf))
+    input_video_path = await save_upload(file)
+    job_id, _ = submit_job(task, input_video_path)
+    return {
+        "job_id": job_id,
+        "status": "processing",
+        "status_url": f"/jobs/{job_id}",
+        "output_url": f"/jobs/{job_id}/output"
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return public_job(job)
+
+
+@app.get("/jobs/{job_id}/output")
+async def get_job_output(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Job failed: {job['error']}")
+    if job["status"] != "complete":
+        raise HTTPException(status_code=409, detail="Job is not complete yet")
+    return FileResponse(job["output_path"], media_type="video/mp4", filename=f"{job_id}.mp4")
+
+
+@app.get("/jobs/{job_id}/track")
+async def get_job_track(job_id: str):
+    """The camera path of a finished job (.npy; columns camera_path.TRACK_COLUMNS, one row per frame)."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "complete":
+        raise HTTPException(status_code=409, detail="Job is not complete yet")
+    return FileResponse(job["track_path"], media_type="application/octet-stream", filename=f"{job_id}_track.npy")
+
+
+@app.post("/jobs/{job_id}/render", status_code=202)
+async def create_render_job(job_id: str, aspect: str = Form(DEFAULT_ASPECT), zoom: float = Form(DEFAULT_ZOOM),
+                            preset: str = Form(ENCODER_PRESET), crf: int = Form(ENCODER_CRF)):
+    """Render a finished job's video again at another aspect ratio, zoom or quality, reusing its camera path."""
+    source = jobs.get(job_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if source["status"] != "complete":
+        raise HTTPException(status_code=409, detail="Job is not complete yet")
+
+    task = functools.partial(rerender_zoom, **parse_framing(aspect, zoom), **parse_encoding(preset, crf))
+    render_id, _ = submit_job(task, source["input_path"], source["track_path"], source_job=job_id)
+    return {
+        "job_id": render_id,
+        "status": "processing",
+        "status_url": f"/jobs/{render_id}",
+        "output_url": f"/jobs/{render_id}/output"
+    }
+
+
+@app.post("/process-video/")
+async def process_video(file: UploadFile = File(...), bbox: Optional[str] = Form(None),
+                        point: Optional[str] = Form(None), detector: str = Form("auto"),
+                        tracker: str = Form(DEFAULT_TRACKER), track_every: int = Form(1),
+                        aspect: str = Form(DEFAULT_ASPECT), zoom: float = Form(DEFAULT_ZOOM),
+                        preset: str = Form(ENCODER_PRESET), crf: int = Form(ENCODER_CRF)):
+    # Same as POST /jobs, but waits for the result (without blocking other requests)
+    task = functools.partial(process_zoom_tracking, **parse_roi(bbox, point, detector),
+                             **parse_options(tracker, track_every), **parse_framing(aspect, zoom),
+                             **parse_encoding(preset, crf))
+    input_video_path = await save_upload(file)
+    job_id, future = submit_job(task, input_video_path)
+    try:
+        await future
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+    # Return the processed video
+    return FileResponse(jobs[job_id]["output_path"], media_type="video/mp4")
+
+
+def process_zoom_tracking(input_video_path, output_video_path, bbox=None, point=None, detector="auto",
+                          redetect_after=REDETECT_AFTER, tracker_engine=DEFAULT_TRACKER, track_every=1,
+                          track_width=TRACK_WIDTH, track_path=None, aspect=9 / 16, zoom_factor=DEFAULT_ZOOM,
+                          preset=ENCODER_PRESET, crf=ENCODER_CRF):
+    """
+    Follow a subject through a video and write a zoomed crop around it, in two passes.
+
+    The analysis pass tracks the subject (see camera_path.analyse_camera_path)
+    and, given a track_path, saves the camera path there; the render pass
+    smooths the path without lag, crops every frame along it and pipes the
+    frames straight into ffmpeg.
+    """
+    track = analyse_camera_path(input_video_path, bbox, point, detector, redetect_after,
+                                tracker_engine, track_every, track_width)
+    if track_path:
+        save_track(track, track_path)
+    return render_camera_path(input_video_path, output_video_path, track, aspect, zoom_factor,
+                              preset=preset, crf=crf)
+
+
+def rerender_zoom(input_video_path, output_video_path, track_path, aspect=9 / 16, zoom_factor=DEFAULT_ZOOM,
+                  preset=ENCODER_PRESET, crf=ENCODER_CRF):
+    """Render pass only, from a camera path saved by an earlier run."""
+    return render_camera_path(input_video_path, output_video_path, load_track(track_path), aspect, zoom_factor,
+                              preset=preset, crf=crf)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,133 @@
+# Benchmark: aizoom tracking speed per tracker mode on synthetic 1080p and 4K clips
+#
+#   python benchmark.py --resolutions 1080p 4k --duration 5 --output bench.json
+#
+# For every mode it reports end-to-end fps of process_zoom_tracking() (decode,
+# track, crop, write) and tracking-only fps (time spent in tracker updates,
+# per source frame, so hybrid modes are credited for the frames they skip).
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from app import process_zoom_tracking
+from tracking import ScaledTracker
+
+RESOLUTIONS = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160)
+}
+
+MODES = {
+    "csrt-full": {"tracker_engine": "csrt", "track_width": 0},
+    "csrt": {"tracker_engine": "csrt"},
+    "kcf": {"tracker_engine": "kcf"},
+    "mosse": {"tracker_engine": "mosse"},
+    "flow": {"tracker_engine": "flow"},
+    "csrt-every3": {"tracker_engine": "csrt", "track_every": 3},
+    "kcf-every3": {"tracker_engine": "kcf", "track_every": 3}
+}
+
+
+def generate_clip(path, width, height, duration, fps=30, seed=0):
+    """
+    Write a clip with a textured block moving over a noisy background.
+
+    Returns:
+    - The block's first-frame bbox (x, y, w, h), used to start every tracker
+    """
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 80, size=(height, width, 3), dtype=np.uint8)
+    block_w, block_h = width // 10, height // 5
+    block = rng.integers(120, 256, size=(block_h, block_w, 3), dtype=np.uint8)
+
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    start = None
+    for i in range(int(duration * fps)):
+        t = i / fps
+        x = int((width - block_w) * (0.5 + 0.4 * np.sin(t * 1.3)))
+        y = int((height - block_h) * (0.5 + 0.3 * np.sin(t * 0.9)))
+        frame = background.copy()
+        frame[y:y + block_h, x:x + block_w] = block
+        out.write(frame)
+        if start is None:
+            start = (x, y, block_w, block_h)
+    out.release()
+    return start
+
+
+def tracking_fps(path, bbox, tracker_engine="csrt", track_every=1, **tracker_args):
+    """Source frames per second of tracker time alone (decoding excluded)."""
+    cap = cv2.VideoCapture(path)
+    ret, frame = cap.read()
+    tracker = ScaledTracker(tracker_engine, **tracker_args)
+    tracker.init(frame, bbox)
+
+    frames, spent = 0, 0.0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames += 1
+        if frames % track_every:
+            continue
+        start = time.perf_counter()
+        tracker.update(frame)
+        spent += time.perf_counter() - start
+    cap.release()
+    return frames / spent if spent else None
+
+
+def run_mode(path, bbox, frames, options, workdir):
+    output = os.path.join(workdir, "out.mp4")
+    start = time.perf_counter()
+    process_zoom_tracking(path, output, bbox=bbox, redetect_after=0, **options)
+    elapsed = time.perf_counter() - start
+    return {
+        "end_to_end_fps": round(frames / elapsed, 1),
+        "tracking_fps": round(tracking_fps(path, bbox, **options) or 0.0, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark aizoom tracker modes")
+    parser.add_argument("--resolutions", nargs="+", choices=RESOLUTIONS, default=["1080p", "4k"])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--duration", type=float, default=5.0, help="Clip length in seconds (30 fps)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="aizoom_bench_") as workdir:
+        for name in args.resolutions:
+            width, height = RESOLUTIONS[name]
+            path = os.path.join(workdir, f"{name}.mp4")
+            bbox = generate_clip(path, width, height, args.duration)
+            frames = int(args.duration * 30)
+            results[name] = {}
+            for mode in args.modes:
+                print(f"Running {name} {mode}...", flush=True)
+                results[name][mode] = run_mode(path, bbox, frames, MODES[mode], workdir)
+
+    report = {
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "duration": args.duration,
+        "results": results
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
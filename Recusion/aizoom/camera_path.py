@@ -0,0 +1,379 @@
+import cv2
+import numpy as np
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from detection import DETECT_FRAMES, detect_subject
+from tracking import DEFAULT_TRACKER, TRACK_WIDTH, ScaledTracker
+
+# Side of the box tracked around a click point, as a fraction of the frame height
+POINT_BOX_FRACTION = 0.25
+
+# Consecutive tracker failures before the subject is searched for again (0 = never)
+REDETECT_AFTER = int(os.environ.get("AIZOOM_REDETECT_AFTER", 15))
+
+# Camera path smoothing: standard deviation of the centred Gaussian, in seconds
+SMOOTH_SECONDS = float(os.environ.get("AIZOOM_SMOOTH_SECONDS", 0.25))
+
+# Processes rendering frame ranges of one video, and the smallest range worth a process
+RENDER_WORKERS = int(os.environ.get("AIZOOM_RENDER_WORKERS", 1))
+MIN_CHUNK_FRAMES = 60
+
+# A render chunk seeks this far before its first frame, twice as far each time it lands past it
+SEEK_MARGIN_SECONDS = 1.0
+
+FFMPEG_BIN = os.environ.get("FFMPEG_BIN", "ffmpeg")
+
+# Output encoding: H.264 (libx264 preset and CRF) with the source audio as AAC
+X264_PRESETS = ("ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow")
+ENCODER_PRESET = os.environ.get("AIZOOM_PRESET", "veryfast")
+ENCODER_CRF = int(os.environ.get("AIZOOM_CRF", 23))
+AUDIO_BITRATE = "128k"
+
+# Columns of a saved track: subject centre and size in source pixels, 1 if tracked in that
+# frame, and the frame's timestamp in milliseconds (as OpenCV reports it)
+TRACK_COLUMNS = ("center_x", "center_y", "width", "height", "tracked", "time_ms")
+
+
+def initial_bbox(frame, bbox=None, point=None):
+    """Box to start tracking from: the given bbox, a box around a click point, or the frame centre."""
+    frame_h, frame_w = frame.shape[:2]
+    if bbox is not None:
+        x, y, w, h = bbox
+        if x >= frame_w or y >= frame_h:
+            raise ValueError(f"bbox starts outside the {frame_w}x{frame_h} frame")
+        return (x, y, min(w, frame_w - x), min(h, frame_h - y))
+
+    size = max(16, int(frame_h * POINT_BOX_FRACTION))
+    if point is not None:
+        cx, cy = point
+        if cx >= frame_w or cy >= frame_h:
+            raise ValueError(f"point is outside the {frame_w}x{frame_h} frame")
+    else:
+        cx, cy = frame_w // 2, frame_h // 2
+    x = min(max(0, cx - size // 2), max(0, frame_w - size))
+    y = min(max(0, cy - size // 2), max(0, frame_h - size))
+    return (x, y, min(size, frame_w), min(size, frame_h))
+
+
+def analyse_camera_path(input_video_path, bbox=None, point=None, detector="auto", redetect_after=REDETECT_AFTER,
+                        tracker_engine=DEFAULT_TRACKER, track_every=1, track_width=TRACK_WIDTH):
+    """
+    Analysis pass: track the subject through the video without rendering anything.
+
+    The subject comes from bbox (x, y, w, h) or point (x, y) in first-frame
+    pixels, else from the detector on the first frames (the frame centre if
+    it finds nothing). After redetect_after failed frames the detector looks
+    for the subject again and restarts the tracker on it. With track_every > 1
+    only every Nth frame is tracked.
+
+    Returns:
+    - float64 array of shape (frames, 6), columns TRACK_COLUMNS; frames that
+      were skipped or lost have tracked = 0 and are filled in when rendering
+    """
+    cap = cv2.VideoCapture(input_video_path)
+
+    if not cap.isOpened():
+        raise RuntimeError("Could not open video.")
+
+    ret, frame = cap.read()
+    if not ret:
+        cap.release()
+        raise RuntimeError("Couldn't read the video frame.")
+
+    # Without an ROI, search the first frames for the subject; they are tracked afterwards as usual
+    first_frames = [frame]
+    times = [cap.get(cv2.CAP_PROP_POS_MSEC)]
+    if bbox is None and point is None:
+        while len(first_frames) < DETECT_FRAMES:
+            ret, next_frame = cap.read()
+            if not ret:
+                break
+            first_frames.append(next_frame)
+            times.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+        bbox = detect_subject(first_frames, detector)
+    bbox = initial_bbox(frame, bbox, point)
+
+    tracker = ScaledTracker(tracker_engine, track_width)
+    tracker.init(frame, bbox)
+
+    rows = [(bbox[0] + bbox[2] / 2, bbox[1] + bbox[3] / 2, bbox[2], bbox[3], 1.0)]
+    failures = 0
+    # Failure limit in tracked frames, so re-detection keeps the same delay in frames
+    max_failures = max(1, redetect_after // track_every) if redetect_after else 0
+    pending = first_frames[1:]
+
+    while True:
+        if pending:
+            frame = pending.pop(0)
+        else:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            times.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+
+        if len(rows) % track_every:
+            rows.append((np.nan, np.nan, np.nan, np.nan, 0.0))
+            continue
+
+        success, found = tracker.update(frame)
+        if success:
+            failures = 0
+            x, y, w, h = found
+            rows.append((x + w / 2, y + h / 2, w, h, 1.0))
+            continue
+
+        rows.append((np.nan, np.nan, np.nan, np.nan, 0.0))
+        failures += 1
+        if max_failures and failures >= max_failures:
+            failures = 0
+            found = detect_subject([frame], detector)
+            if found is not None:
+                tracker = ScaledTracker(tracker_engine, track_width)
+                tracker.init(frame, found)
+
+    cap.release()
+    return np.column_stack((np.asarray(rows, dtype=np.float64), times))
+
+
+def save_track(track, path):
+    np.save(path, track)
+    return path
+
+
+def load_track(path):
+    track = np.load(path)
+    if track.ndim != 2 or track.shape[1] != len(TRACK_COLUMNS):
+        raise ValueError(f"{path} is not a camera track")
+    return track
+
+
+def fill_gaps(values, tracked):
+    """Linear interpolation over frames without a tracked value; the ends hold the nearest one."""
+    known = np.flatnonzero(tracked)
+    if known.size == 0:
+        return None
+    return np.interp(np.arange(values.size), known, values[known])
+
+
+def smooth_path(values, sigma_frames):
+    """
+    Zero-phase smoothing: a centred Gaussian looks as far ahead as it looks
+    back, so the camera moves with the subject instead of lagging behind it.
+    """
+    if sigma_frames <= 0 or values.size < 2:
+        return values
+    radius = int(3 * sigma_frames)
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (offsets / sigma_frames) ** 2)
+    kernel /= kernel.sum()
+    padded = np.pad(values, radius, mode="edge")
+    return np.convolve(padded, kernel, mode="valid")
+
+
+def output_size(frame_w, frame_h, aspect):
+    """Largest even output size with the given width/height ratio that fits the source frame."""
+    out_h = frame_h
+    out_w = int(frame_h * aspect)
+    if out_w > frame_w:
+        out_w, out_h = frame_w, int(frame_w / aspect)
+    return out_w - out_w % 2, out_h - out_h % 2
+
+
+def crop_windows(track, frame_w, frame_h, fps, aspect=9 / 16, zoom_factor=1.4, smooth_seconds=SMOOTH_SECONDS):
+    """
+    Per-frame crop windows from a saved track.
+
+    The subject centre is gap-filled and smoothed, then a window of the
+    output aspect ratio, zoom_factor times smaller than the output frame, is
+    centred on it and shifted (never squeezed) to stay inside the source.
+
+    Returns:
+    - int array of shape (frames, 4): x, y, width, height
+    """
+    out_w, out_h = output_size(frame_w, frame_h, aspect)
+    crop_w = max(2, min(frame_w, int(out_w / zoom_factor)))
+    crop_h = max(2, min(frame_h, int(out_h / zoom_factor)))
+
+    tracked = track[:, 4] > 0
+    centers = []
+    for column, default in ((0, frame_w / 2), (1, frame_h / 2)):
+        values = fill_gaps(track[:, column].astype(np.float64), tracked)
+        if values is None:
+            values = np.full(len(track), default)
+        centers.append(smooth_path(values, smooth_seconds * fps))
+
+    x = np.clip(np.round(centers[0] - crop_w / 2), 0, frame_w - crop_w).astype(np.int32)
+    y = np.clip(np.round(centers[1] - crop_h / 2), 0, frame_h - crop_h).astype(np.int32)
+    return np.column_stack((x, y, np.full_like(x, crop_w), np.full_like(y, crop_h)))
+
+
+def _audio_args(audio_source, duration):
+    """
+    Map the first audio track of the source (if any) as the output's second
+    input. The output is cut at the video's duration, so longer audio is
+    trimmed and shorter audio never shortens the video.
+    """
+    if not audio_source:
+        return [], []
+    limit = ["-t", f"{duration:.6f}"] if duration else []
+    return ["-i", audio_source], ["-map", "1:a:0?", "-c:a", "aac", "-b:a", AUDIO_BITRATE, *limit]
+
+
+def seek_frame(input_video_path, times, index):
+    """
+    Open the source and decode frame `index`, counting frames as the analysis pass read them.
+
+    OpenCV's frame-number seek is not frame-accurate for open GOPs, B-frames
+    or variable frame rates, so the frame is found by the timestamp the
+    analysis pass recorded for it: the capture seeks to before it (further
+    back each time it lands past it) and decodes forward. Without usable
+    timestamps it decodes from the first frame.
+
+    Returns:
+    - (capture, frame); frame is None if the video ends first
+    """
+    cap = cv2.VideoCapture(input_video_path)
+    if index and np.all(np.diff(times) > 0):
+        target = times[index]
+        margin = SEEK_MARGIN_SECONDS * 1000
+        while target - margin > 0:
+            cap.set(cv2.CAP_PROP_POS_MSEC, target - margin)
+            position = None
+            while cap.grab():
+                position = cap.get(cv2.CAP_PROP_POS_MSEC)
+                if position >= target - 0.5:
+                    break
+            # Same file, same timestamp computation: the right frame matches to well under a millisecond
+            if position is not None and abs(position - target) <= 0.5:
+                return cap, cap.retrieve()[1]
+            margin *= 2
+        cap.release()
+        cap = cv2.VideoCapture(input_video_path)
+
+    for _ in range(index):
+        if not cap.grab():
+            return cap, None
+    return cap, cap.read()[1]
+
+
+def render_range(input_video_path, output_video_path, windows, size, start, stop, fps,
+                 preset=ENCODER_PRESET, crf=ENCODER_CRF, audio_source=None, times=None):
+    """
+    Render frames [start, stop) of the source, cropped by windows, to their own file.
+
+    Cropped frames are piped raw into ffmpeg and encoded once as H.264 at the
+    source frame rate, with audio_source's audio muxed in when given, into a
+    faststart MP4. A range starting after frame 0 needs the track's frame
+    times to find its first frame (see seek_frame).
+    """
+    if start:
+        cap, frame = seek_frame(input_video_path, times, start)
+    else:
+        cap = cv2.VideoCapture(input_video_path)
+        frame = cap.read()[1]
+
+    audio_inputs, audio_outputs = _audio_args(audio_source, (stop - start) / fps)
+    cmd = [
+        FFMPEG_BIN, "-nostdin", "-y", "-v", "error",
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{size[0]}x{size[1]}", "-r", repr(fps), "-i", "pipe:0",
+        *audio_inputs,
+        "-map", "0:v:0", *audio_outputs,
+        "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart",
+        output_video_path
+    ]
+    written = 0
+    broken = False
+    with tempfile.TemporaryFile() as stderr:
+        encoder = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=stderr)
+        try:
+            for index in range(start, stop):
+                if frame is None:
+                    break
+                x, y, w, h = windows[index]
+                encoder.stdin.write(cv2.resize(frame[y:y + h, x:x + w], size, interpolation=cv2.INTER_LINEAR).data)
+                written += 1
+                if index + 1 < stop:
+                    frame = cap.read()[1]
+            encoder.stdin.close()
+        except BrokenPipeError:
+            # ffmpeg stopped reading before the last frame: the output is incomplete even if it exits with 0
+            broken = True
+            try:
+                encoder.stdin.close()
+            except BrokenPipeError:
+                pass
+        finally:
+            cap.release()
+        if encoder.wait() != 0 or broken:
+            stderr.seek(0)
+            detail = stderr.read().decode(errors="ignore").strip()
+            raise RuntimeError(f"ffmpeg encode failed after {written} of {stop - start} frames"
+                               + (f": {detail}" if detail else ""))
+    return written
+
+
+def concat_videos(paths, output_video_path, audio_source=None, duration=None):
+    """
+    Join equally encoded chunks without re-encoding, muxing in audio_source's
+    audio, cut at duration (the video's, in seconds), when given.
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as listing:
+        for path in paths:
+            listing.write(f"file '{os.path.abspath(path)}'\n")
+    audio_inputs, audio_outputs = _audio_args(audio_source, duration)
+    try:
+        subprocess.run([FFMPEG_BIN, "-nostdin", "-y", "-v", "error", "-f", "concat", "-safe", "0",
+                        "-i", listing.name, *audio_inputs, "-map", "0:v:0", *audio_outputs,
+                        "-c:v", "copy", "-movflags", "+faststart", output_video_path],
+                       capture_output=True, check=True)
+    finally:
+        os.remove(listing.name)
+
+
+def render_camera_path(input_video_path, output_video_path, track, aspect=9 / 16, zoom_factor=1.4,
+                       workers=RENDER_WORKERS, smooth_seconds=SMOOTH_SECONDS, preset=ENCODER_PRESET,
+                       crf=ENCODER_CRF):
+    """
+    Render pass: crop every frame along the smoothed camera path.
+
+    The output is H.264 at the source frame rate with the source audio. With
+    workers > 1 the frames are split into contiguous ranges encoded by
+    separate processes, each finding its first frame by the track's frame
+    times, then joined with ffmpeg's concat demuxer (stream copy) while the
+    audio is muxed in.
+    """
+    cap = cv2.VideoCapture(input_video_path)
+    if not cap.isOpened():
+        raise RuntimeError("Could not open video.")
+    frame_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    frame_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    windows = crop_windows(track, frame_w, frame_h, fps, aspect, zoom_factor, smooth_seconds)
+    size = output_size(frame_w, frame_h, aspect)
+    frames = len(windows)
+
+    workers = max(1, min(workers, frames // MIN_CHUNK_FRAMES))
+    if workers == 1:
+        render_range(input_video_path, output_video_path, windows, size, 0, frames, fps, preset, crf,
+                     audio_source=input_video_path)
+        return output_video_path
+
+    bounds = np.linspace(0, frames, workers + 1).astype(int)
+    chunk_dir = tempfile.mkdtemp(prefix="aizoom_chunks_", dir=os.path.dirname(os.path.abspath(output_video_path)))
+    try:
+        chunks = [os.path.join(chunk_dir, f"chunk_{i}.mp4") for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(render_range, [input_video_path] * workers, chunks, [windows] * workers,
+                          [size] * workers, bounds[:-1], bounds[1:], [fps] * workers, [preset] * workers,
+                          [crf] * workers, [None] * workers, [track[:, 5]] * workers))
+        concat_videos(chunks, output_video_path, audio_source=input_video_path, duration=frames / fps)
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+    return output_video_path
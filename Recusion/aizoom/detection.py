@@ -0,0 +1,117 @@
+import cv2
+import numpy as np
+import os
+
+# Detection runs on frames scaled down to at most this width
+DETECT_WIDTH = int(os.environ.get("AIZOOM_DETECT_WIDTH", 640))
+
+# First frames searched for the subject when no ROI is given
+DETECT_FRAMES = int(os.environ.get("AIZOOM_DETECT_FRAMES", 5))
+
+# Detectors tried in order by "auto"; all run on the CPU and ship with OpenCV
+DETECTORS = ("face", "person", "saliency")
+
+_face_cascade = None
+_hog = None
+
+
+def _scaled(frame):
+    """Colour frame scaled down to at most DETECT_WIDTH wide, and the factor back to full resolution."""
+    scale = min(1.0, DETECT_WIDTH / frame.shape[1])
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+    return small, 1.0 / scale
+
+
+def detect_faces(frame):
+    global _face_cascade
+    if _face_cascade is None:
+        _face_cascade = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml"))
+    small, back = _scaled(frame)
+    grey = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    faces = _face_cascade.detectMultiScale(grey, scaleFactor=1.1, minNeighbors=5, minSize=(24, 24))
+    return [tuple(int(v * back) for v in face) for face in faces]
+
+
+def detect_people(frame):
+    global _hog
+    if _hog is None:
+        _hog = cv2.HOGDescriptor()
+        _hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+    small, back = _scaled(frame)
+    people, weights = _hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+    return [tuple(int(v * back) for v in person)
+            for person, weight in zip(people, np.ravel(weights)) if weight > 0.5]
+
+
+def detect_salient(frame):
+    """Bounding box of the largest salient region (spectral residual saliency)."""
+    small, back = _scaled(frame)
+    saliency = cv2.saliency.StaticSaliencySpectralResidual_create()
+    ok, saliency_map = saliency.computeSaliency(small)
+    if not ok:
+        return []
+    saliency_map = (saliency_map * 255).astype(np.uint8)
+    _, mask = cv2.threshold(saliency_map, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((9, 9), np.uint8))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return []
+    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+    # A "salient" region covering most of the frame says nothing about the subject
+    if w * h > 0.6 * small.shape[0] * small.shape[1]:
+        return []
+    return [tuple(int(v * back) for v in (x, y, w, h))]
+
+
+DETECTOR_FUNCTIONS = {
+    "face": detect_faces,
+    "person": detect_people,
+    "saliency": detect_salient
+}
+
+
+def _iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    union = aw * ah + bw * bh - w * h
+    return w * h / union if union else 0.0
+
+
+def dominant_subject(detections_per_frame):
+    """
+    Pick the subject seen most consistently and largest across frames.
+
+    Every detection scores its area times the number of frames with an
+    overlapping detection (IoU > 0.3), so a large subject present in every
+    frame beats a one-off false positive.
+    """
+    candidates = [box for boxes in detections_per_frame for box in boxes]
+    if not candidates:
+        return None
+
+    def score(box):
+        seen = sum(any(_iou(box, other) > 0.3 for other in boxes) for boxes in detections_per_frame)
+        return box[2] * box[3] * seen
+
+    return max(candidates, key=score)
+
+
+def detect_subject(frames, detector="auto"):
+    """
+    Find the dominant subject in a few frames.
+
+    Parameters:
+    - frames: BGR frames, usually the first few of the video
+    - detector: 'face', 'person', 'saliency', or 'auto' to try them in that order
+
+    Returns:
+    - (x, y, w, h) in the frames' pixels, or None if nothing was found
+    """
+    names = DETECTORS if detector == "auto" else (detector,)
+    for name in names:
+        subject = dominant_subject([DETECTOR_FUNCTIONS[name](frame) for frame in frames])
+        if subject is not None:
+            return subject
+    return None
@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+import os
+
+# Tracking runs on frames scaled down to at most this width (0 = full resolution)
+TRACK_WIDTH = int(os.environ.get("AIZOOM_TRACK_WIDTH", 640))
+
+TRACKERS = ("csrt", "kcf", "mosse", "flow")
+DEFAULT_TRACKER = os.environ.get("AIZOOM_TRACKER", "csrt")
+
+# Optical-flow tracker: corners followed per update, and how many must survive
+FLOW_MAX_POINTS = 60
+FLOW_MIN_POINTS = 8
+
+
+class OpticalFlowTracker:
+    """
+    Lucas-Kanade tracker: follows corners inside the box and moves the box by
+    their median displacement. Cheapest of the engines, with no appearance
+    model, so it drifts on long occlusions.
+    """
+
+    def __init__(self):
+        self.grey = None
+        self.bbox = None
+
+    def _corners(self, grey, bbox):
+        x, y, w, h = [int(v) for v in bbox]
+        mask = np.zeros_like(grey)
+        mask[max(0, y):y + h, max(0, x):x + w] = 255
+        return cv2.goodFeaturesToTrack(grey, FLOW_MAX_POINTS, 0.01, 5, mask=mask)
+
+    def init(self, frame, bbox):
+        self.grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.bbox = tuple(float(v) for v in bbox)
+        return True
+
+    def update(self, frame):
+        grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        points = self._corners(self.grey, self.bbox)
+        if points is None or len(points) < FLOW_MIN_POINTS:
+            self.grey = grey
+            return False, self.bbox
+
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.grey, grey, points, None, winSize=(21, 21), maxLevel=3)
+        self.grey = grey
+        good = status.ravel() == 1
+        if good.sum() < FLOW_MIN_POINTS:
+            return False, self.bbox
+
+        dx, dy = np.median((moved[good] - points[good]).reshape(-1, 2), axis=0)
+        x, y, w, h = self.bbox
+        self.bbox = (x + float(dx), y + float(dy), w, h)
+        return True, self.bbox
+
+
+def create_tracker(engine):
+    if engine == "csrt":
+        return cv2.legacy.TrackerCSRT_create()
+    if engine == "kcf":
+        return cv2.legacy.TrackerKCF_create()
+    if engine == "mosse":
+        return cv2.legacy.TrackerMOSSE_create()
+    if engine == "flow":
+        return OpticalFlowTracker()
+    raise ValueError(f"Unknown tracker {engine}, expected one of {list(TRACKERS)}")
+
+
+class ScaledTracker:
+    """
+    Runs a tracker engine on a downscaled copy of each frame and reports
+    boxes in full-resolution pixels, so the cost of tracking no longer grows
+    with the source resolution.
+    """
+
+    def __init__(self, engine=DEFAULT_TRACKER, track_width=TRACK_WIDTH):
+        self.engine = engine
+        self.track_width = track_width
+        self.scale = 1.0
+        self.tracker = None
+
+    def _small(self, frame):
+        if self.scale == 1.0:
+            return frame
+        return cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def init(self, frame, bbox):
+        frame_w = frame.shape[1]
+        self.scale = min(1.0, self.track_width / frame_w) if self.track_width else 1.0
+        self.tracker = create_tracker(self.engine)
+        # Trackers need a box of at least a few pixels after scaling
+        small_box = tuple(max(4, int(round(v * self.scale))) if i >= 2 else int(round(v * self.scale))
+                          for i, v in enumerate(bbox))
+        self.tracker.init(self._small(frame), small_box)
+
+    def update(self, frame):
+        success, bbox = self.tracker.update(self._small(frame))
+        return success, tuple(v / self.scale for v in bbox)
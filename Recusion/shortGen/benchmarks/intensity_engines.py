@@ -0,0 +1,106 @@
+# Benchmark: ResNet vs motion intensity engines (speed and ranking agreement)
+#
+# Run from the shortGen directory:
+#   python -m benchmarks.intensity_engines path/to/video.mp4 --scene-length 5 --output intensity.json
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from utils.motion_intensity import analyze_motion_intensity
+
+
+def fixed_scenes(duration, scene_length):
+    """Split [0, duration) into consecutive scenes of scene_length seconds."""
+    starts = np.arange(0.0, duration, scene_length)
+    return [(float(s), float(min(duration, s + scene_length))) for s in starts]
+
+
+def video_duration(video_path):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        return cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    finally:
+        cap.release()
+
+
+def spearman(a, b):
+    """Spearman rank correlation of two equally long score arrays."""
+    rank_a = np.argsort(np.argsort(a))
+    rank_b = np.argsort(np.argsort(b))
+    if np.std(rank_a) == 0 or np.std(rank_b) == 0:
+        return 0.0
+    return float(np.corrcoef(rank_a, rank_b)[0, 1])
+
+
+def run_engine(name, func, video_path, scenes, repeat):
+    timings = []
+    scores = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scores = func(video_path, scenes, top_k=None)
+        timings.append(time.perf_counter() - start)
+    by_scene = {item['scene']: item['intensity'] for item in scores}
+    return {
+        'engine': name,
+        'seconds': min(timings),
+        'runs': timings,
+        'scores': [by_scene.get(i + 1, 0.0) for i in range(len(scenes))]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the ResNet and motion intensity engines')
+    parser.add_argument('video')
+    parser.add_argument('--scene-length', type=float, default=5.0, help='Seconds per benchmark scene')
+    parser.add_argument('--top-k', type=int, default=5, help='Size of the top-k agreement check')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--skip-resnet', action='store_true', help='Only time the motion engine')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    duration = video_duration(args.video)
+    scenes = fixed_scenes(duration, args.scene_length)
+
+    engines = [('motion', analyze_motion_intensity)]
+    if not args.skip_resnet:
+        # Imported lazily so the motion engine can be timed on nodes without torch
+        from utils.scene_intensity import analyze_scene_intensity
+        engines.insert(0, ('resnet', analyze_scene_intensity))
+
+    results = [run_engine(name, func, args.video, scenes, args.repeat) for name, func in engines]
+
+    report = {
+        'video': args.video,
+        'duration_seconds': duration,
+        'scenes': len(scenes),
+        'engines': {
+            r['engine']: {
+                'seconds': round(r['seconds'], 3),
+                'realtime_factor': round(duration / r['seconds'], 2) if r['seconds'] else None
+            }
+            for r in results
+        }
+    }
+
+    if len(results) == 2:
+        resnet_scores, motion_scores = np.array(results[0]['scores']), np.array(results[1]['scores'])
+        top_resnet = set(np.argsort(-resnet_scores)[:args.top_k])
+        top_motion = set(np.argsort(-motion_scores)[:args.top_k])
+        report['agreement'] = {
+            'spearman': round(spearman(resnet_scores, motion_scores), 4),
+            f'top_{args.top_k}_overlap': len(top_resnet & top_motion) / float(max(1, min(args.top_k, len(scenes)))),
+            'speedup': round(results[0]['seconds'] / results[1]['seconds'], 2) if results[1]['seconds'] else None
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
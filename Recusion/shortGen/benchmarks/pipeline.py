@@ -0,0 +1,240 @@
+# Benchmark: the shortGen pipeline end to end and stage by stage, on synthetic videos
+#
+# Run from the shortGen directory:
+#   python -m benchmarks.pipeline --duration 120 --width 1280 --height 720 --scenes 24 --repeat 3 --output bench.json
+#
+# Each benchmark runs in a fresh process so its peak memory is its own. The
+# JSON report is meant to be diffed across commits.
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks.synthetic import generate_video, synthetic_segments
+
+BENCHMARKS = ('scene_intensity', 'motion_intensity', 'analyze_video', 'sentiment', 'segment_sentiment',
+              'merge_scores', 'render', 'process_video')
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux
+    return round(own / 1024.0, 1), round(children / 1024.0, 1)
+
+
+def _percentiles(timings):
+    return {
+        'p50': round(float(np.percentile(timings, 50)), 4),
+        'p90': round(float(np.percentile(timings, 90)), 4),
+        'p99': round(float(np.percentile(timings, 99)), 4),
+        'min': round(float(np.min(timings)), 4),
+        'max': round(float(np.max(timings)), 4)
+    }
+
+
+def _bench_scene_intensity(video, repeat):
+    from utils.scene_intensity import analyze_scene_intensity
+    return _time(repeat, lambda: analyze_scene_intensity(video['path'], video['scene_times'], top_k=None))
+
+
+def _bench_motion_intensity(video, repeat):
+    from utils.motion_intensity import analyze_motion_intensity
+    return _time(repeat, lambda: analyze_motion_intensity(video['path'], video['scene_times'], top_k=None))
+
+
+def _bench_analyze_video(video, repeat, engine='motion'):
+    from utils.video_analysis import analyze_video
+    return _time(repeat, lambda: analyze_video(video['path'], intensity_engine=engine, top_k=None))
+
+
+def _bench_sentiment(video, repeat):
+    from utils.sentiment_analysis import analyze_sentiment
+    transcript = '. '.join(segment['text'] for segment in synthetic_segments(video['duration']))
+    return _time(repeat, lambda: analyze_sentiment(transcript))
+
+
+def _bench_segment_sentiment(video, repeat):
+    from utils.sentiment_analysis import analyze_segment_sentiment
+    segments = synthetic_segments(video['duration'])
+    return _time(repeat, lambda: analyze_segment_sentiment(segments, top_k=None))
+
+
+def _bench_merge_scores(video, repeat):
+    from video import merge_scores
+    rng = np.random.default_rng(0)
+    segments = synthetic_segments(video['duration'])
+    sentiment_scores = [
+        {'start_time': s['start'], 'end_time': s['end'], 'score': float(rng.uniform(-1, 1))} for s in segments
+    ]
+    intensity_scores = [
+        {'scene': i + 1, 'start_time': start, 'end_time': end, 'intensity': float(rng.uniform(0, 1))}
+        for i, (start, end) in enumerate(video['scene_times'])
+    ]
+    return _time(repeat, lambda: merge_scores(sentiment_scores, intensity_scores, num_highlights=5))
+
+
+def _bench_render(video, repeat, num_highlights=3, highlight_length=10.0):
+    from utils.clip_cutter import CutPlanner
+    from utils.render_scheduler import EncodeSlots, render_highlights
+    output_dir = tempfile.mkdtemp(prefix='render_', dir='.')
+    step = video['duration'] / num_highlights
+    # Mid-GOP starts so the smart-cut path is exercised, not only stream copy
+    segments = [(i * step + 0.7, min(video['duration'], i * step + 0.7 + highlight_length)) for i in range(num_highlights)]
+    try:
+        return _time(repeat, lambda: render_highlights(CutPlanner(video['path']), segments, output_dir, slots=EncodeSlots()))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def _bench_process_video(video, repeat, engine='motion'):
+    import video as app_module
+    timings = []
+    stages = None
+    for i in range(repeat):
+        job_id = f"bench-{os.getpid()}-{i}"
+        shutil.copy(video['path'], f"{job_id}.mp4")
+        app_module.job_store.create_job(job_id, {'filename': f"{job_id}.mp4"})
+        start = time.perf_counter()
+        ok = app_module.process_video(f"{job_id}.mp4", job_id, 3, (10, 20), engine)
+        timings.append(time.perf_counter() - start)
+        job = app_module.job_store.get_job(job_id)
+        if not ok:
+            raise RuntimeError(job.get('error'))
+        stages = job.get('stages')
+    return timings, {'stages': stages}
+
+
+def _time(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings, {}
+
+
+def _run_benchmark(name, video, repeat, engine, queue):
+    """Child process entry point: run one benchmark and send back its timings and peak memory."""
+    try:
+        func = globals()[f"_bench_{name}"]
+        if name in ('analyze_video', 'process_video'):
+            timings, extra = func(video, repeat, engine)
+        else:
+            timings, extra = func(video, repeat)
+        own, children = _peak_rss_mb() or (None, None)
+        queue.put({'timings': timings, 'peak_rss_mb': own, 'children_peak_rss_mb': children, **extra})
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {str(e)}", 'traceback': traceback.format_exc()})
+
+
+def run_isolated(name, video, repeat, engine):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_benchmark, args=(name, video, repeat, engine, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+
+    if 'error' in result:
+        return {'error': result['error']}
+    timings = result.pop('timings')
+    latency = _percentiles(timings)
+    result.update({
+        'runs': len(timings),
+        'latency_seconds': latency,
+        # Seconds of source video processed per second of wall time, at the median
+        'throughput': round(video['duration'] / latency['p50'], 2) if latency['p50'] else None
+    })
+    return result
+
+
+def git_revision(repo_dir):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_dir, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the shortGen pipeline on synthetic videos')
+    parser.add_argument('--duration', type=float, default=60.0, help='Synthetic video length in seconds')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=360)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--scenes', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark')
+    parser.add_argument('--engine', choices=('resnet', 'motion'), default='motion',
+                        help='Intensity engine for analyze_video and process_video')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, help='Run only these benchmarks')
+    parser.add_argument('--workdir', help='Keep the video and job files here instead of a temporary directory')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    shortgen_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if shortgen_dir not in sys.path:
+        sys.path.insert(0, shortgen_dir)
+
+    revision = git_revision(shortgen_dir)
+
+    # The app writes uploads/, results/, jobs.db and cache/ relative to the working directory
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix='shortgen_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    os.environ['JOBS_DB_PATH'] = os.path.join(workdir, 'jobs.db')
+    os.environ['CACHE_FOLDER'] = os.path.join(workdir, 'cache')
+
+    try:
+        start = time.perf_counter()
+        video = generate_video(os.path.join(workdir, 'synthetic.mp4'), args.duration, args.width, args.height,
+                               args.fps, args.scenes, args.seed)
+        generate_seconds = time.perf_counter() - start
+
+        results = {}
+        for name in args.only or BENCHMARKS:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = run_isolated(name, video, args.repeat, args.engine)
+
+        report = {
+            'revision': revision,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'video': {key: video[key] for key in ('duration', 'width', 'height', 'fps')},
+            'scenes': len(video['scene_times']),
+            'engine': args.engine,
+            'generate_seconds': round(generate_seconds, 3),
+            'benchmarks': results
+        }
+    finally:
+        if not args.workdir:
+            os.chdir(shortgen_dir)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+# Synthetic test videos for the benchmarks, generated offline with NumPy and ffmpeg
+#
+# Run from the shortGen directory:
+#   python -m benchmarks.synthetic out.mp4 --duration 120 --width 1280 --height 720 --scenes 24
+import argparse
+import json
+import subprocess
+
+import numpy as np
+
+from utils.media import FFMPEG_BIN
+
+
+def scene_layout(duration, num_scenes):
+    """Equal-length scenes covering [0, duration)."""
+    edges = np.linspace(0.0, duration, num_scenes + 1)
+    return [(round(float(start), 3), round(float(end), 3)) for start, end in zip(edges[:-1], edges[1:])]
+
+
+def generate_video(output_path, duration=60.0, width=640, height=360, fps=30, num_scenes=12, seed=0):
+    """
+    Render a synthetic H.264/AAC video with hard scene cuts.
+
+    Every scene has its own background colour, noise texture and a moving
+    block whose speed varies per scene, so scene detection and the intensity
+    engines have real work to do. The audio is a tone per scene, silent for
+    the last 20% of each scene, which gives transcription chunking silences
+    to cut in. Keyframes fall every two seconds, like typical camera files.
+
+    Returns:
+    - dict with path, duration, width, height, fps and the ground-truth scene_times
+    """
+    rng = np.random.default_rng(seed)
+    scenes = scene_layout(duration, num_scenes)
+    scene_length = duration / num_scenes
+
+    colours = rng.integers(0, 256, size=(num_scenes, 3), dtype=np.uint8)
+    speeds = rng.uniform(1.0, 12.0, size=num_scenes)
+    noise_levels = rng.integers(0, 40, size=num_scenes, dtype=np.uint8)
+    textures = rng.integers(0, 256, size=(4, height, width), dtype=np.uint8)
+
+    audio = (
+        f"aevalsrc='0.3*sin(2*PI*(220+110*floor(t/{scene_length:.6f}))*t)"
+        f"*lt(mod(t,{scene_length:.6f}),{0.8 * scene_length:.6f})':s=16000:d={duration}"
+    )
+    cmd = [
+        FFMPEG_BIN, '-nostdin', '-y', '-v', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+        '-f', 'lavfi', '-i', audio,
+        '-map', '0:v', '-map', '1:a',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-pix_fmt', 'yuv420p', '-g', str(int(fps * 2)),
+        '-c:a', 'aac', '-b:a', '96k',
+        '-shortest', '-movflags', '+faststart',
+        output_path
+    ]
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    block_w, block_h = max(8, width // 8), max(8, height // 6)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    try:
+        for i in range(int(round(duration * fps))):
+            t = i / fps
+            scene = min(num_scenes - 1, int(t / scene_length))
+            frame[:] = colours[scene]
+            if noise_levels[scene]:
+                texture = textures[i % len(textures)] % noise_levels[scene]
+                frame += texture[:, :, None]
+
+            x = int(t * speeds[scene] * 40) % max(1, width - block_w)
+            y = int((height - block_h) * (0.5 + 0.4 * np.sin(t * speeds[scene])))
+            frame[y:y + block_h, x:x + block_w] = 255
+            process.stdin.write(frame.tobytes())
+        process.stdin.close()
+    except BrokenPipeError:
+        pass
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg failed to generate {output_path}")
+
+    return {
+        'path': output_path,
+        'duration': float(duration),
+        'width': width,
+        'height': height,
+        'fps': fps,
+        'scene_times': scenes
+    }
+
+
+def synthetic_segments(duration, segment_length=4.0, seed=0):
+    """
+    Timestamped transcript segments with varied sentiment, shaped like transcribe_audio() output.
+
+    Used to benchmark the text stages without running Whisper.
+    """
+    rng = np.random.default_rng(seed)
+    phrases = [
+        'This is absolutely amazing, what a fantastic moment',
+        'I really hate how terrible and awful that was',
+        'We are walking over to the next table now',
+        'Wow, incredible, the crowd loves it',
+        'That was a disappointing and sad result',
+        'Here is the plan for the rest of the afternoon'
+    ]
+    segments = []
+    start = 0.0
+    while start < duration:
+        end = min(duration, start + segment_length * rng.uniform(0.5, 1.5))
+        segments.append({'start': round(start, 3), 'end': round(end, 3), 'text': phrases[rng.integers(len(phrases))]})
+        start = end
+    return segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic benchmark video')
+    parser.add_argument('output')
+    parser.add_argument('--duration', type=float, default=60.0)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=360)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--scenes', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    info = generate_video(args.output, args.duration, args.width, args.height, args.fps, args.scenes, args.seed)
+    print(json.dumps(info, indent=2))
+
+
+if __name__ == '__main__':
+    main()
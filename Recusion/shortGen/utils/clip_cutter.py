@@ -0,0 +1,226 @@
+import bisect
+import logging
+import os
+import subprocess
+import tempfile
+
+from utils.media import FFMPEG_BIN, probe_keyframes, probe_video
+
+logger = logging.getLogger(__name__)
+
+# How far (seconds) a cut point may move to land on a keyframe for a pure stream copy
+KEYFRAME_TOLERANCE = float(os.environ.get('KEYFRAME_TOLERANCE', 0.5))
+
+# Codecs whose GOP edges can be re-encoded and spliced back onto stream-copied packets
+SMART_CUT_VIDEO_CODECS = {'h264'}
+SMART_CUT_AUDIO_CODECS = {'aac', None}
+
+# ffprobe profile names -> libx264 -profile:v values
+X264_PROFILES = {
+    'baseline': 'baseline',
+    'constrainedbaseline': 'baseline',
+    'main': 'main',
+    'high': 'high'
+}
+
+
+class CutPlanner:
+    """
+    Chooses how to cut each highlight from one source file.
+
+    Keyframes and stream info are probed once per source and reused for all
+    of its highlights.
+    """
+
+    def __init__(self, video_path, tolerance=KEYFRAME_TOLERANCE):
+        self.video_path = video_path
+        self.tolerance = tolerance
+        self.info = probe_video(video_path)
+        try:
+            self.keyframes = probe_keyframes(video_path)
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Keyframe probe failed, cuts will be re-encoded: {str(e)}")
+            self.keyframes = []
+
+    def nearest_keyframe(self, t):
+        if not self.keyframes:
+            return None
+        i = bisect.bisect_left(self.keyframes, t)
+        candidates = self.keyframes[max(0, i - 1):i + 1]
+        return min(candidates, key=lambda k: abs(k - t))
+
+    def next_keyframe(self, t):
+        i = bisect.bisect_right(self.keyframes, t)
+        return self.keyframes[i] if i < len(self.keyframes) else None
+
+    def plan(self, start, end, filters=None):
+        """
+        Return (method, start) for a cut.
+
+        - 'copy': start snapped to a keyframe within tolerance, stream copy only
+        - 'smart': re-encode up to the next keyframe, stream copy the rest
+        - 'encode': full re-encode (filters requested or no usable keyframes)
+        """
+        if filters:
+            return 'encode', start
+
+        keyframe = self.nearest_keyframe(start)
+        if keyframe is not None and abs(keyframe - start) <= self.tolerance and keyframe < end:
+            return 'copy', keyframe
+
+        next_keyframe = self.next_keyframe(start)
+        if (next_keyframe is not None and next_keyframe < end
+                and self.info.get('video_codec') in SMART_CUT_VIDEO_CODECS
+                and self.info.get('audio_codec') in SMART_CUT_AUDIO_CODECS):
+            return 'smart', start
+
+        return 'encode', start
+
+
+def _run_ffmpeg(args, duration=None, progress_callback=None):
+    """
+    Run ffmpeg, optionally reporting the fraction of `duration` written so far.
+
+    Raises CalledProcessError (with stderr) if ffmpeg fails.
+    """
+    cmd = [FFMPEG_BIN, '-nostdin', '-y', '-v', 'error'] + args
+    if progress_callback is None or not duration:
+        subprocess.run(cmd, check=True, capture_output=True)
+        return
+
+    # -progress writes key=value lines to stdout; out_time_us is the position written so far
+    cmd = cmd[:-1] + ['-progress', 'pipe:1', '-nostats', cmd[-1]]
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, text=True)
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            if key in ('out_time_us', 'out_time_ms') and value.isdigit():
+                progress_callback(min(1.0, int(value) / 1e6 / duration))
+        process.wait()
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr.read())
+
+
+def _container_args(output_path):
+    """faststart for MP4/MOV outputs; MPEG-TS parts need no muxer options."""
+    return ['-movflags', '+faststart'] if output_path.lower().endswith(('.mp4', '.mov')) else []
+
+
+def _stream_copy(video_path, start, end, output_path):
+    _run_ffmpeg([
+        '-ss', f"{start:.3f}", '-i', video_path,
+        '-t', f"{end - start:.3f}",
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-c', 'copy',
+        '-avoid_negative_ts', 'make_zero'
+    ] + _container_args(output_path) + [output_path])
+
+
+def _encode(video_path, start, end, output_path, has_audio, threads, filters=None, video_args=None,
+            encoder_args=None, audio_args=None, progress_callback=None):
+    args = [
+        '-ss', f"{start:.3f}", '-i', video_path,
+        '-t', f"{end - start:.3f}",
+        '-map', '0:v:0'
+    ]
+    if has_audio:
+        args += ['-map', '0:a:0']
+    if filters:
+        args += ['-vf', filters]
+    args += (encoder_args or ['-c:v', 'libx264']) + (video_args or [])
+    args += ['-c:a', 'aac'] + (audio_args or []) if has_audio else ['-an']
+    args += ['-threads', str(threads)] + _container_args(output_path) + [output_path]
+    _run_ffmpeg(args, duration=end - start, progress_callback=progress_callback)
+
+
+def _smart_cut(planner, start, end, output_path, threads, progress_callback=None):
+    """
+    Re-encode [start, next keyframe) and stream copy [next keyframe, end), then concatenate.
+
+    The head comes from libx264 and the tail from the source's encoder, so
+    their SPS/PPS differ, and an MP4 track has a single avcC for all of
+    them. Both parts are therefore written as MPEG-TS, where every keyframe
+    carries its parameter sets in-band (Annex B), joined there and only
+    then remuxed to MP4, which keeps the tail's parameter sets in its samples.
+    """
+    info = planner.info
+    split = planner.next_keyframe(start)
+
+    # Match the source stream's format, so the head and the copied tail decode as one stream
+    video_args = []
+    if info.get('pix_fmt'):
+        video_args += ['-pix_fmt', info['pix_fmt']]
+    profile = X264_PROFILES.get((info.get('profile') or '').lower().replace(' ', ''))
+    if profile:
+        video_args += ['-profile:v', profile]
+    if info.get('fps'):
+        video_args += ['-r', f"{info['fps']:.6f}"]
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as tmp:
+        head = os.path.join(tmp, 'head.ts')
+        tail = os.path.join(tmp, 'tail.ts')
+        listing = os.path.join(tmp, 'parts.txt')
+
+        # The re-encoded head is the only slow part; report it as its share of the clip
+        head_callback = None
+        if progress_callback is not None:
+            head_share = (split - start) / (end - start)
+            head_callback = lambda fraction: progress_callback(fraction * head_share)
+
+        _encode(planner.video_path, start, split, head, info.get('has_audio'), threads, video_args=video_args,
+                progress_callback=head_callback)
+        _stream_copy(planner.video_path, split, end, tail)
+
+        with open(listing, 'w') as f:
+            f.write(f"file '{head}'\nfile '{tail}'\n")
+
+        _run_ffmpeg([
+            '-f', 'concat', '-safe', '0', '-i', listing,
+            '-c', 'copy', '-movflags', '+faststart',
+            output_path
+        ])
+
+
+def cut_clip(planner, start, end, output_path, filters=None, threads=2, progress_callback=None,
+             encoder_args=None, audio_args=None):
+    """
+    Cut [start, end) from the planner's source into output_path with ffmpeg.
+
+    Falls back to a full re-encode if a stream copy or smart cut fails.
+
+    Parameters:
+    - planner: CutPlanner for the source video
+    - start, end: Cut points in seconds
+    - output_path: Destination MP4
+    - filters: Optional ffmpeg -vf filter chain (forces a full re-encode)
+    - threads: Encoder threads for the re-encoded parts
+    - progress_callback: Optional callable receiving the completed fraction (0-1)
+    - encoder_args: Video codec arguments for full re-encodes (default: libx264 defaults)
+    - audio_args: Extra AAC arguments for full re-encodes, e.g. ['-b:a', '128k']
+
+    Returns:
+    - dict with 'method' ('copy', 'smart' or 'encode') and the actual 'start_time' and 'end_time'
+    """
+    method, actual_start = planner.plan(start, end, filters=filters)
+    has_audio = planner.info.get('has_audio')
+
+    try:
+        if method == 'copy':
+            _stream_copy(planner.video_path, actual_start, end, output_path)
+        elif method == 'smart':
+            _smart_cut(planner, start, end, output_path, threads, progress_callback=progress_callback)
+        else:
+            _encode(planner.video_path, start, end, output_path, has_audio, threads, filters=filters,
+                    encoder_args=encoder_args, audio_args=audio_args, progress_callback=progress_callback)
+    except subprocess.CalledProcessError as e:
+        if method == 'encode':
+            raise
+        logger.warning(f"{method} cut failed ({e.stderr.decode(errors='ignore').strip()}), re-encoding instead")
+        method, actual_start = 'encode', start
+        _encode(planner.video_path, start, end, output_path, has_audio, threads, filters=filters,
+                encoder_args=encoder_args, audio_args=audio_args, progress_callback=progress_callback)
+
+    if progress_callback is not None:
+        progress_callback(1.0)
+    return {'method': method, 'start_time': actual_start, 'end_time': end}
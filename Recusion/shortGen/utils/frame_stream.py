@@ -0,0 +1,109 @@
+import logging
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# Gaps longer than this (in seconds) between wanted frames are skipped with a
+# forward seek on the open capture instead of decoding every frame in between
+SEEK_THRESHOLD_SECONDS = 10.0
+
+
+def iter_frames(video_path):
+    """
+    Decode every frame of the video once, in order.
+
+    Yields:
+    - (frame_index, timestamp, frame) tuples, frame being a BGR numpy array
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        logger.error(f"Could not open video: {video_path}")
+        return
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_index = 0
+        while True:
+            success, frame = cap.read()
+            if not success:
+                break
+            yield frame_index, frame_index / fps, frame
+            frame_index += 1
+    finally:
+        cap.release()
+
+
+def scene_sample_times(scene_times, frames_per_scene=1):
+    """
+    Return the timestamps to sample for each scene.
+
+    The first sample is always the scene start (what the per-scene seek used to
+    read); additional samples are spread evenly across the scene.
+    """
+    samples = []
+    for scene_index, (start_time, end_time) in enumerate(scene_times):
+        length = max(0.0, float(end_time) - float(start_time))
+        for j in range(frames_per_scene):
+            samples.append((float(start_time) + length * j / frames_per_scene, scene_index))
+    return samples
+
+
+def iter_scene_frames(video_path, scene_times, frames_per_scene=1, seek_threshold=SEEK_THRESHOLD_SECONDS):
+    """
+    Decode the video once, in timestamp order, yielding the sample frames of every scene.
+
+    Parameters:
+    - video_path: Path to the video file
+    - scene_times: List of (start_time, end_time) tuples in seconds
+    - frames_per_scene: Number of frames to sample per scene
+    - seek_threshold: Gap in seconds above which the reader seeks forward instead of decoding through
+
+    Yields:
+    - (scene_index, frame) tuples, frame being a BGR numpy array, ordered by timestamp
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        logger.error(f"Could not open video: {video_path}")
+        return
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        seek_gap = int(seek_threshold * fps)
+
+        # Map every sample timestamp to a frame index, in decode order
+        targets = sorted(
+            (int(round(t * fps)), scene_index)
+            for t, scene_index in scene_sample_times(scene_times, frames_per_scene)
+        )
+
+        position = 0  # Index of the next frame the decoder will return
+        i = 0
+        while i < len(targets):
+            frame_index = targets[i][0]
+
+            if frame_index - position > seek_gap:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                position = frame_index
+
+            # Decode (without converting) up to the wanted frame
+            grabbed = True
+            while position < frame_index:
+                grabbed = cap.grab()
+                if not grabbed:
+                    break
+                position += 1
+            if not grabbed:
+                break
+
+            success, frame = cap.read()
+            if not success:
+                break
+            position += 1
+
+            # Several samples can land on the same frame (very short scenes)
+            while i < len(targets) and targets[i][0] <= frame_index:
+                yield targets[i][1], frame
+                i += 1
+    finally:
+        cap.release()
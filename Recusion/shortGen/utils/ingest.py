@@ -0,0 +1,273 @@
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+import uuid
+
+from utils.media import probe_video
+
+logger = logging.getLogger(__name__)
+
+# Bytes needed to recognise the container from its signature
+SNIFF_BYTES = 16
+# Bytes after which the partial file is probed, to reject non-video uploads early
+PROBE_BYTES = 4 * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class UnsupportedMediaError(Exception):
+    """
+    Raised as soon as an upload is known not to be a usable video.
+
+    Deliberately not a ValueError: werkzeug's form parser silently swallows
+    ValueErrors, which would turn a rejected upload into an empty form.
+    """
+
+
+def sniff_container(header):
+    """
+    Identify the container from the first bytes of a file.
+
+    Returns:
+    - 'mp4' (MP4/MOV), 'matroska' (MKV/WebM), 'avi', or None if unrecognised
+    """
+    if len(header) >= 12 and header[4:8] in (b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip'):
+        return 'mp4'
+    if header[:4] == b'\x1a\x45\xdf\xa3':
+        return 'matroska'
+    if header[:4] == b'RIFF' and header[8:12] == b'AVI ':
+        return 'avi'
+    return None
+
+
+class IngestWriter:
+    """
+    File-like sink that writes an upload to disk while hashing and probing it.
+
+    The container signature is checked on the first bytes and ffprobe runs on
+    the partial file once probe_bytes have arrived, so an unsupported upload is
+    rejected (UnsupportedMediaError from write()) before it finishes. That
+    early probe only validates: a prefix can misreport the duration (WebM
+    without a Duration element, fragmented MP4), so finish() always probes the
+    complete file for the info the job uses.
+
+    Can be resumed by passing the bytes already on disk and a hasher fed with them.
+    """
+
+    def __init__(self, path, probe_bytes=PROBE_BYTES, hasher=None, written=0, probed=False):
+        self.path = path
+        self.probe_bytes = probe_bytes
+        self.bytes_written = written
+        self.probe = None
+        self.probed = probed
+        self.container = None
+        self._hash = hasher or hashlib.sha256()
+        self._file = open(path, 'r+b' if written else 'w+b')
+
+        # Resuming: pick up the signature from the bytes already on disk
+        self._head = self._file.read(SNIFF_BYTES) if written else b''
+        if len(self._head) >= SNIFF_BYTES:
+            self._check_container()
+        self._file.seek(written)
+
+    def write(self, data):
+        self._file.write(data)
+        self._hash.update(data)
+        self.bytes_written += len(data)
+
+        if self.container is None:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_container()
+
+        if not self.probed and self.bytes_written >= self.probe_bytes:
+            self.probed = True
+            self._file.flush()
+            self._try_probe(final=False)
+        return len(data)
+
+    def _check_container(self):
+        self.container = sniff_container(self._head)
+        if self.container is None:
+            raise UnsupportedMediaError('Unrecognised file format, expected MP4, MOV, MKV, WebM or AVI')
+
+    def _try_probe(self, final):
+        try:
+            info = probe_video(self.path)
+        except (subprocess.CalledProcessError, ValueError) as e:
+            if final:
+                raise UnsupportedMediaError('File could not be read as a video') from e
+            logger.info(f"Early probe of {os.path.basename(self.path)} inconclusive, retrying when complete")
+            return None
+        if not info['has_video']:
+            raise UnsupportedMediaError('File contains no video stream')
+        return info
+
+    def finish(self):
+        """Close the file and make sure it is a probed, supported video. Returns the probe info."""
+        self._file.flush()
+        self._file.close()
+        if self.container is None:
+            self._check_container()
+        self.probe = self._try_probe(final=True)
+        return self.probe
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    # File API werkzeug uses on form-data file streams
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def copy_stream(stream, writer, chunk_size=COPY_CHUNK_SIZE):
+    """Pump a request body into an IngestWriter chunk by chunk."""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        writer.write(chunk)
+
+
+class UploadSessions:
+    """
+    Resumable chunked uploads.
+
+    Each session is a .part file plus a JSON sidecar recording the filename,
+    declared size and bytes received, so a client can resume from the stored
+    offset after a dropped connection or a server restart. The running hash
+    is kept in memory and rebuilt from the .part file when it is missing.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self._hashers = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.folder, f"{upload_id}.json")
+
+    def part_path(self, upload_id):
+        return os.path.join(self.folder, f"{upload_id}.part")
+
+    def lock(self, upload_id):
+        with self._guard:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def create(self, filename, size=None):
+        upload_id = str(uuid.uuid4())
+        session = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'size': size,
+            'offset': 0,
+            'probed': False,
+            'created_at': time.time()
+        }
+        open(self.part_path(upload_id), 'wb').close()
+        self._save(session)
+        self._hashers[upload_id] = hashlib.sha256()
+        return session
+
+    def get(self, upload_id):
+        try:
+            with open(self._meta_path(upload_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, session):
+        tmp_path = self._meta_path(session['upload_id']) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(session, f)
+        os.replace(tmp_path, self._meta_path(session['upload_id']))
+
+    def _hasher(self, session):
+        hasher = self._hashers.get(session['upload_id'])
+        if hasher is None:
+            # Server restarted mid-upload: rebuild the hash from what is on disk
+            hasher = hashlib.sha256()
+            with open(self.part_path(session['upload_id']), 'rb') as f:
+                for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+            self._hashers[session['upload_id']] = hasher
+        return hasher
+
+    def append(self, session, stream):
+        """
+        Append a request body to the session at its current offset.
+
+        Raises UnsupportedMediaError (and discards the session) if the data is not a usable video.
+        """
+        writer = IngestWriter(
+            self.part_path(session['upload_id']),
+            hasher=self._hasher(session),
+            written=session['offset'],
+            probed=session['probed']
+        )
+        try:
+            copy_stream(stream, writer)
+        except UnsupportedMediaError:
+            writer.abort()
+            self.discard(session['upload_id'])
+            raise
+        finally:
+            writer.close()
+            session['offset'] = writer.bytes_written
+            session['probed'] = writer.probed
+            if self.get(session['upload_id']) is not None:
+                self._save(session)
+        return session
+
+    def complete(self, session):
+        """
+        Validate the finished upload.
+
+        Returns:
+        - (part_path, content_hash, probe_info)
+        """
+        writer = IngestWriter(
+            self.part_path(session['upload_id']),
+            hasher=self._hasher(session),
+            written=session['offset'],
+            probed=True
+        )
+        try:
+            info = writer.finish()
+        except UnsupportedMediaError:
+            writer.abort()
+            self.discard(session['upload_id'])
+            raise
+        return self.part_path(session['upload_id']), writer.hexdigest(), info
+
+    def discard(self, upload_id):
+        self._hashers.pop(upload_id, None)
+        for path in (self._meta_path(upload_id), self.part_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,43 @@
+import heapq
+
+
+def overlap_join(left, right):
+    """
+    Find every overlapping pair between two lists of time intervals.
+
+    Sweep over both lists in start order, keeping a heap of the right-hand
+    intervals that may still overlap, so the cost is O((n + m) log m + k)
+    for k overlapping pairs instead of n * m comparisons.
+
+    Parameters:
+    - left, right: Lists of (start_time, end_time) tuples
+
+    Returns:
+    - List (one entry per left interval, in input order) of lists of
+      (right_index, overlap_seconds) tuples
+    """
+    matches = [[] for _ in left]
+    right_order = sorted(range(len(right)), key=lambda j: right[j][0])
+    left_order = sorted(range(len(left)), key=lambda i: left[i][0])
+
+    active = []  # heap of (end_time, right_index)
+    next_right = 0
+    for i in left_order:
+        start, end = left[i]
+
+        # Admit right intervals that start before this one ends
+        while next_right < len(right_order) and right[right_order[next_right]][0] < end:
+            j = right_order[next_right]
+            heapq.heappush(active, (right[j][1], j))
+            next_right += 1
+
+        # Drop right intervals that ended before this one starts; later left intervals start even later
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+
+        for _, j in active:
+            overlap = min(end, right[j][1]) - max(start, right[j][0])
+            if overlap > 0:
+                matches[i].append((j, overlap))
+
+    return matches
@@ -0,0 +1,385 @@
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+# Job states that still occupy a slot in the queue
+PENDING_STATUSES = ('queued', 'processing')
+
+
+class JobStore:
+    """
+    Durable job store backed by SQLite.
+
+    Every call opens its own connection, so a single store can be shared by
+    the Flask process and any number of worker processes. Job fields other
+    than the indexed columns (id, status, priority, created_at, updated_at)
+    are kept as a JSON document and merged on update.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._init_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    worker TEXT,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority DESC, created_at)'
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS worker_stats (
+                    worker_id TEXT PRIMARY KEY,
+                    updated_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_job(row):
+        job = json.loads(row['data'])
+        job.update({
+            'id': row['id'],
+            'status': row['status'],
+            'priority': row['priority'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        })
+        return job
+
+    def create_job(self, job_id, data, priority=0):
+        """Insert a new queued job and return it."""
+        now = time.time()
+        data = dict(data)
+        data.setdefault('progress', 0)
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO jobs (id, status, priority, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, 'queued', int(priority), data.pop('created_at', now), now, json.dumps(data))
+            )
+        finally:
+            conn.close()
+        return self.get_job(job_id)
+
+    def get_job(self, job_id):
+        """Return the job as a dict, or None if it does not exist."""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_job(row) if row else None
+
+    def update_job(self, job_id, **fields):
+        """
+        Merge fields into a job.
+
+        The read-modify-write runs inside an immediate transaction so that
+        concurrent updates from different processes never lose each other.
+        Returns False if the job no longer exists.
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT status, priority, data FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                conn.execute('ROLLBACK')
+                return False
+
+            data = json.loads(row['data'])
+            status = fields.pop('status', row['status'])
+            priority = int(fields.pop('priority', row['priority']))
+            data.update(fields)
+
+            conn.execute(
+                'UPDATE jobs SET status = ?, priority = ?, updated_at = ?, data = ? WHERE id = ?',
+                (status, priority, time.time(), json.dumps(data), job_id)
+            )
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def update_highlight(self, job_id, filename, **fields):
+        """
+        Merge fields into the metadata entry of one highlight, by its filename.
+
+        Same transaction as update_job, so renders of different highlights of
+        a job can record their results at the same time. Returns False if the
+        job or highlight does not exist.
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT data FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            data = json.loads(row['data']) if row else {}
+            entry = next((item for item in data.get('metadata') or [] if item.get('filename') == filename), None)
+            if entry is None:
+                conn.execute('ROLLBACK')
+                return False
+
+            entry.update(fields)
+            conn.execute('UPDATE jobs SET updated_at = ?, data = ? WHERE id = ?',
+                         (time.time(), json.dumps(data), job_id))
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def claim_next_job(self, worker_id):
+        """
+        Atomically move the highest-priority queued job to 'processing'.
+
+        Returns the claimed job, or None if the queue is empty.
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute('ROLLBACK')
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'processing', worker = ?, updated_at = ? WHERE id = ?",
+                (worker_id, time.time(), row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return self.get_job(row['id'])
+
+    def count_jobs(self, statuses=None):
+        """Count jobs, optionally restricted to the given statuses."""
+        conn = self._connect()
+        try:
+            if statuses:
+                placeholders = ','.join('?' for _ in statuses)
+                row = conn.execute(
+                    f'SELECT COUNT(*) FROM jobs WHERE status IN ({placeholders})', tuple(statuses)
+                ).fetchone()
+            else:
+                row = conn.execute('SELECT COUNT(*) FROM jobs').fetchone()
+        finally:
+            conn.close()
+        return row[0]
+
+    def queue_position(self, job_id):
+        """
+        Return the 1-based position of a queued job (1 = next to run),
+        or None if the job is not waiting in the queue.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT status, priority, created_at FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None or row['status'] != 'queued':
+                return None
+            ahead = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' "
+                "AND (priority > ? OR (priority = ? AND created_at < ?))",
+                (row['priority'], row['priority'], row['created_at'])
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        return ahead + 1
+
+    def list_jobs(self, created_before=None):
+        """Return all jobs, optionally only those created before a timestamp."""
+        conn = self._connect()
+        try:
+            if created_before is not None:
+                rows = conn.execute('SELECT * FROM jobs WHERE created_at < ?', (created_before,)).fetchall()
+            else:
+                rows = conn.execute('SELECT * FROM jobs').fetchall()
+        finally:
+            conn.close()
+        return [self._row_to_job(row) for row in rows]
+
+    def delete_job(self, job_id):
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+        finally:
+            conn.close()
+
+    def set_worker_stats(self, worker_id, stats):
+        """Publish a worker's stats snapshot so the API process can report it."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO worker_stats (worker_id, updated_at, data) VALUES (?, ?, ?)',
+                (worker_id, time.time(), json.dumps(stats))
+            )
+        finally:
+            conn.close()
+
+    def get_worker_stats(self):
+        """Return the latest stats snapshot of every worker, keyed by worker id."""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT * FROM worker_stats ORDER BY worker_id').fetchall()
+        finally:
+            conn.close()
+        return {
+            row['worker_id']: dict(json.loads(row['data']), updated_at=row['updated_at'])
+            for row in rows
+        }
+
+    def requeue_interrupted(self):
+        """
+        Put jobs that were 'processing' when the service stopped back in the queue.
+
+        Call this once at startup before any worker is running.
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, updated_at = ? WHERE status = 'processing'",
+                (time.time(),)
+            )
+            count = cursor.rowcount
+        finally:
+            conn.close()
+        if count:
+            logger.info(f"Re-queued {count} interrupted jobs")
+        return count
+
+
+def _publish_stats(store, worker_id, stats_provider):
+    if stats_provider is None:
+        return
+    try:
+        store.set_worker_stats(worker_id, stats_provider())
+    except Exception as e:
+        logger.warning(f"Worker {worker_id} could not publish stats: {str(e)}")
+
+
+def _worker_loop(worker_id, db_path, handler, poll_interval, stop_event, initializer, initargs, stats_provider):
+    """Main loop of a queue worker process."""
+    store = JobStore(db_path)
+
+    if initializer is not None:
+        try:
+            initializer(*initargs)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} initializer failed: {str(e)}")
+    _publish_stats(store, worker_id, stats_provider)
+
+    logger.info(f"Worker {worker_id} started (pid {os.getpid()})")
+
+    while not stop_event.is_set():
+        try:
+            job = store.claim_next_job(worker_id)
+        except sqlite3.Error as e:
+            logger.error(f"Worker {worker_id} could not claim a job: {str(e)}")
+            job = None
+
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+
+        logger.info(f"Worker {worker_id} picked up job {job['id']}")
+        try:
+            handler(job)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} failed job {job['id']}: {str(e)}\n{traceback.format_exc()}")
+            store.update_job(job['id'], status='failed', error=str(e))
+        _publish_stats(store, worker_id, stats_provider)
+
+    logger.info(f"Worker {worker_id} stopped")
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of worker processes draining a JobStore.
+
+    Parameters:
+    - db_path: Path of the SQLite job store
+    - handler: Picklable callable invoked with the job dict for each claimed job
+    - num_workers: Number of worker processes (= max concurrent pipelines)
+    - poll_interval: Seconds an idle worker waits before polling the queue again
+    - initializer: Optional callable run once in each worker before it takes jobs
+    - initargs: Arguments for the initializer
+    - stats_provider: Optional callable whose result is published to the store after each job
+    """
+
+    def __init__(self, db_path, handler, num_workers=2, poll_interval=1.0, initializer=None, initargs=(),
+                 stats_provider=None):
+        self.db_path = db_path
+        self.handler = handler
+        self.num_workers = max(1, int(num_workers))
+        self.poll_interval = poll_interval
+        self.initializer = initializer
+        self.initargs = initargs
+        self.stats_provider = stats_provider
+        self._stop_event = multiprocessing.Event()
+        self._processes = []
+
+    def start(self):
+        if self._processes:
+            return
+        for i in range(self.num_workers):
+            worker_id = f"worker-{i + 1}"
+            # Workers are not daemonic so that stages may use their own process pools
+            process = multiprocessing.Process(
+                target=_worker_loop,
+                name=worker_id,
+                args=(worker_id, self.db_path, self.handler, self.poll_interval,
+                      self._stop_event, self.initializer, self.initargs, self.stats_provider),
+                daemon=False
+            )
+            process.start()
+            self._processes.append(process)
+        logger.info(f"Started {self.num_workers} queue workers")
+
+    def stop(self, timeout=None):
+        """Ask workers to finish their current job and exit."""
+        self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout)
+        self._processes = []
+
+    def alive_workers(self):
+        return sum(1 for process in self._processes if process.is_alive())
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import subprocess
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# External tools (override when ffmpeg is not on PATH)
+FFMPEG_BIN = os.environ.get('FFMPEG_BIN', 'ffmpeg')
+FFPROBE_BIN = os.environ.get('FFPROBE_BIN', 'ffprobe')
+
+# Sample rate Whisper expects, also used for loudness analysis
+AUDIO_SAMPLE_RATE = 16000
+
+
+def load_audio(video_path, sample_rate=AUDIO_SAMPLE_RATE):
+    """
+    Decode the first audio track of a file to mono float32 samples in memory.
+
+    Returns:
+    - numpy array of samples in [-1, 1], or None if the file has no audio
+    """
+    cmd = [
+        FFMPEG_BIN, '-nostdin', '-v', 'error',
+        '-i', video_path,
+        '-map', '0:a:0', '-vn',
+        '-ac', '1', '-ar', str(sample_rate),
+        '-f', 'f32le', '-'
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        logger.info(f"No decodable audio in {os.path.basename(video_path)}: {e.stderr.decode(errors='ignore').strip()}")
+        return None
+
+    samples = np.frombuffer(result.stdout, dtype=np.float32)
+    return samples if samples.size else None
+
+
+def _parse_rate(rate):
+    try:
+        num, den = rate.split('/')
+        return float(num) / float(den) if float(den) else 0.0
+    except (ValueError, AttributeError):
+        return 0.0
+
+
+def probe_video(video_path):
+    """
+    Read container and stream metadata with ffprobe.
+
+    Returns:
+    - dict with duration, format, has_audio, video_codec, audio_codec, width,
+      height, fps, pix_fmt and profile of the first video stream
+    """
+    cmd = [
+        FFPROBE_BIN, '-v', 'error',
+        '-show_format', '-show_streams',
+        '-of', 'json', video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    info = json.loads(result.stdout or b'{}')
+
+    streams = info.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), {})
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), {})
+    fmt = info.get('format', {})
+
+    return {
+        'duration': float(fmt.get('duration') or video.get('duration') or 0.0),
+        'format': fmt.get('format_name'),
+        'has_video': bool(video),
+        'has_audio': bool(audio),
+        'video_codec': video.get('codec_name'),
+        'audio_codec': audio.get('codec_name'),
+        'width': video.get('width'),
+        'height': video.get('height'),
+        'fps': _parse_rate(video.get('avg_frame_rate') or video.get('r_frame_rate')),
+        'pix_fmt': video.get('pix_fmt'),
+        'profile': video.get('profile')
+    }
+
+
+def probe_keyframes(video_path):
+    """Return the sorted presentation times (seconds) of the video's keyframes."""
+    cmd = [
+        FFPROBE_BIN, '-v', 'error',
+        '-select_streams', 'v:0',
+        '-skip_frame', 'nokey',
+        '-show_entries', 'frame=pts_time',
+        '-of', 'csv=p=0', video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, check=True, text=True)
+    keyframes = []
+    for line in result.stdout.splitlines():
+        value = line.strip().rstrip(',')
+        if value and value != 'N/A':
+            keyframes.append(float(value))
+    return sorted(keyframes)
+
+
+def top_level_boxes(path):
+    """Yield (type, offset, size) of the top-level boxes of an MP4/MOV file."""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            header = f.read(16)
+            size = int.from_bytes(header[:4], 'big')
+            box_type = header[4:8].decode('latin-1')
+            if size == 1 and len(header) == 16:  # 64-bit size follows the type
+                size = int.from_bytes(header[8:16], 'big')
+            elif size == 0:  # box runs to the end of the file
+                size = file_size - offset
+            if size < 8:
+                return
+            yield box_type, offset, size
+            offset += size
+
+
+def is_faststart(path):
+    """Whether the moov box comes before the media data, so playback can start while downloading."""
+    for box_type, _, _ in top_level_boxes(path):
+        if box_type == 'moov':
+            return True
+        if box_type == 'mdat':
+            return False
+    return False
+
+
+def make_faststart(path):
+    """Move the moov box of an MP4 to the front in place (stream copy, no re-encode)."""
+    root, ext = os.path.splitext(path)
+    tmp_path = f"{root}.{os.getpid()}.faststart{ext}"
+    cmd = [
+        FFMPEG_BIN, '-nostdin', '-y', '-v', 'error',
+        '-i', path, '-map', '0', '-c', 'copy', '-movflags', '+faststart',
+        tmp_path
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, check=True)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,207 @@
+import logging
+import sqlite3
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds
+SECONDS_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800)
+BYTES_BUCKETS = tuple(2 ** power * 1024 * 1024 for power in range(4, 14))  # 16 MB .. 8 GB
+
+# Per-stage measurements: name -> (kind, help text, buckets)
+STAGE_METRICS = {
+    'wall_seconds': ('histogram', 'Wall-clock time of a pipeline stage', SECONDS_BUCKETS),
+    'cpu_seconds': ('histogram', 'CPU time of the thread running a pipeline stage', SECONDS_BUCKETS),
+    'peak_rss_bytes': ('histogram', 'Peak resident memory of the worker process at the end of a stage', BYTES_BUCKETS),
+    'read_bytes': ('counter', 'Bytes read from storage by a pipeline stage', None),
+    'write_bytes': ('counter', 'Bytes written to storage by a pipeline stage', None),
+}
+
+METRIC_PREFIX = 'shortgen_stage'
+
+
+def _read_io_counters():
+    """
+    Storage bytes read/written so far by the calling thread.
+
+    Uses /proc/thread-self/io so concurrent stages are not charged for each
+    other's I/O; falls back to the whole process, or zeros off Linux.
+    """
+    for path in ('/proc/thread-self/io', '/proc/self/io'):
+        try:
+            with open(path) as f:
+                fields = dict(line.split(': ') for line in f.read().splitlines())
+            return int(fields['read_bytes']), int(fields['write_bytes'])
+        except (OSError, KeyError, ValueError):
+            continue
+    return 0, 0
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return 0
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StageMeter:
+    """
+    Context manager measuring one stage in the thread that runs it.
+
+    After the block, .metrics holds wall_seconds, cpu_seconds, peak_rss_bytes,
+    read_bytes and write_bytes. CPU time and I/O are the thread's own, so
+    work done in child processes (ffmpeg, transcription pool) is not included;
+    peak RSS is the worker process high-water mark.
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.metrics = {}
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        self._io = _read_io_counters()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        read_bytes, write_bytes = _read_io_counters()
+        self.metrics = {
+            'wall_seconds': round(time.perf_counter() - self._wall, 4),
+            'cpu_seconds': round(time.thread_time() - self._cpu, 4),
+            'peak_rss_bytes': _peak_rss_bytes(),
+            'read_bytes': max(0, read_bytes - self._io[0]),
+            'write_bytes': max(0, write_bytes - self._io[1])
+        }
+        return False
+
+
+class MetricsStore:
+    """
+    Stage measurements aggregated across jobs and processes in SQLite.
+
+    Every recorded stage run updates cumulative histogram buckets, sums and
+    counts in place, so rendering /api/metrics costs the same however many
+    jobs have run.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._init_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stage_buckets (
+                    metric TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    le REAL NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (metric, stage, le)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stage_totals (
+                    metric TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    sum REAL NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (metric, stage)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stage_runs (
+                    stage TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (stage, status)
+                )
+            """)
+        finally:
+            conn.close()
+
+    def record(self, stage, status, metrics):
+        """Add one stage run (status 'ok' or 'failed') with its StageMeter metrics."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT INTO stage_runs (stage, status, count) VALUES (?, ?, 1) '
+                'ON CONFLICT(stage, status) DO UPDATE SET count = count + 1',
+                (stage, status)
+            )
+            for metric, (kind, _, buckets) in STAGE_METRICS.items():
+                value = metrics.get(metric)
+                if value is None:
+                    continue
+                conn.execute(
+                    'INSERT INTO stage_totals (metric, stage, sum, count) VALUES (?, ?, ?, 1) '
+                    'ON CONFLICT(metric, stage) DO UPDATE SET sum = sum + excluded.sum, count = count + 1',
+                    (metric, stage, value)
+                )
+                if kind != 'histogram':
+                    continue
+                # Cumulative buckets: the run counts towards every bound it fits under
+                for le in buckets + (float('inf'),):
+                    conn.execute(
+                        'INSERT INTO stage_buckets (metric, stage, le, count) VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT(metric, stage, le) DO UPDATE SET count = count + excluded.count',
+                        (metric, stage, le, 1 if value <= le else 0)
+                    )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def render_prometheus(self):
+        """Return all stage metrics in the Prometheus text exposition format."""
+        conn = self._connect()
+        try:
+            buckets = conn.execute('SELECT metric, stage, le, count FROM stage_buckets ORDER BY metric, stage, le').fetchall()
+            totals = conn.execute('SELECT metric, stage, sum, count FROM stage_totals ORDER BY metric, stage').fetchall()
+            runs = conn.execute('SELECT stage, status, count FROM stage_runs ORDER BY stage, status').fetchall()
+        finally:
+            conn.close()
+
+        lines = [
+            f'# HELP {METRIC_PREFIX}_runs_total Pipeline stage runs by outcome',
+            f'# TYPE {METRIC_PREFIX}_runs_total counter'
+        ]
+        for stage, status, count in runs:
+            lines.append(f'{METRIC_PREFIX}_runs_total{{stage="{stage}",status="{status}"}} {count}')
+
+        for metric, (kind, help_text, _) in STAGE_METRICS.items():
+            name = f'{METRIC_PREFIX}_{metric}' if kind == 'histogram' else f'{METRIC_PREFIX}_{metric}_total'
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'histogram':
+                for row_metric, stage, le, count in buckets:
+                    if row_metric == metric:
+                        bound = '+Inf' if le == float('inf') else _format_value(le)
+                        lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            for row_metric, stage, total, count in totals:
+                if row_metric != metric:
+                    continue
+                if kind == 'histogram':
+                    lines.append(f'{name}_sum{{stage="{stage}"}} {_format_value(total)}')
+                    lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+                else:
+                    lines.append(f'{name}{{stage="{stage}"}} {_format_value(total)}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,160 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Memory budget for resident models, in MB (0 = unlimited)
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get('MODEL_MEMORY_BUDGET_MB', 0))
+
+
+def estimate_model_size(model):
+    """Estimate the resident size of a model in bytes (parameters + buffers for torch modules)."""
+    size = 0
+    if hasattr(model, 'parameters'):
+        size += sum(p.numel() * p.element_size() for p in model.parameters())
+    if hasattr(model, 'buffers'):
+        size += sum(b.numel() * b.element_size() for b in model.buffers())
+    return size
+
+
+class ModelRegistry:
+    """
+    Process-local cache of loaded models.
+
+    Models are registered by name with a loader function, loaded on first use
+    (or up front via warm()), and kept resident until the memory budget forces
+    the least recently used ones out. Load times and hit/miss counts are kept
+    per model so cold starts are visible.
+    """
+
+    def __init__(self, memory_budget_mb=MODEL_MEMORY_BUDGET_MB):
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._loaders = {}
+        self._models = OrderedDict()
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, loader, size_estimator=estimate_model_size):
+        """
+        Register a model loader.
+
+        Parameters:
+        - name: Key used with get()
+        - loader: Zero-argument callable returning the loaded model
+        - size_estimator: Callable returning the model's size in bytes
+        """
+        with self._lock:
+            self._loaders[name] = (loader, size_estimator)
+            self._stats.setdefault(name, {
+                'loaded': False,
+                'loads': 0,
+                'hits': 0,
+                'misses': 0,
+                'evictions': 0,
+                'last_load_seconds': None,
+                'total_load_seconds': 0.0,
+                'size_bytes': 0
+            })
+
+    def get(self, name):
+        """Return the named model, loading it if it is not resident."""
+        with self._lock:
+            if name not in self._loaders:
+                raise KeyError(f"Unknown model: {name}")
+
+            stats = self._stats[name]
+            if name in self._models:
+                self._models.move_to_end(name)
+                stats['hits'] += 1
+                return self._models[name]
+
+            stats['misses'] += 1
+            loader, size_estimator = self._loaders[name]
+
+            start = time.perf_counter()
+            model = loader()
+            elapsed = time.perf_counter() - start
+
+            try:
+                size = size_estimator(model) if size_estimator else 0
+            except Exception:
+                size = 0
+
+            stats.update({
+                'loaded': True,
+                'loads': stats['loads'] + 1,
+                'last_load_seconds': round(elapsed, 3),
+                'total_load_seconds': round(stats['total_load_seconds'] + elapsed, 3),
+                'size_bytes': size
+            })
+            logger.info(f"Loaded model '{name}' in {elapsed:.2f}s ({size / (1024 * 1024):.1f} MB)")
+
+            self._models[name] = model
+            self._enforce_budget(keep=name)
+            return model
+
+    def warm(self, names=None):
+        """Load the given models (default: all registered) ahead of the first job."""
+        for name in names or list(self._loaders):
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.error(f"Failed to warm model '{name}': {str(e)}")
+
+    def evict(self, name):
+        with self._lock:
+            if self._models.pop(name, None) is not None:
+                self._stats[name]['loaded'] = False
+                self._stats[name]['evictions'] += 1
+                logger.info(f"Evicted model '{name}'")
+
+    def _enforce_budget(self, keep):
+        if not self.memory_budget:
+            return
+        while self._resident_bytes() > self.memory_budget and len(self._models) > 1:
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            self.evict(oldest)
+
+    def _resident_bytes(self):
+        return sum(self._stats[name]['size_bytes'] for name in self._models)
+
+    def stats(self):
+        """Return a snapshot of per-model counters plus the resident total."""
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'memory_budget_bytes': self.memory_budget,
+                'resident_bytes': self._resident_bytes(),
+                'models': {name: dict(stats) for name, stats in self._stats.items()}
+            }
+
+
+def load_whisper_base():
+    import whisper
+    return whisper.load_model("base")
+
+
+def load_resnet50():
+    import torch
+    from torchvision import models
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    model = models.resnet50(pretrained=True).to(device)
+    model.eval()
+    return model
+
+
+def load_vader():
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer()
+
+
+# Default registry used by the analysis modules
+registry = ModelRegistry()
+registry.register('whisper-base', load_whisper_base)
+registry.register('resnet50', load_resnet50)
+registry.register('vader', load_vader, size_estimator=None)
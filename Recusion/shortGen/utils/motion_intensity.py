@@ -0,0 +1,211 @@
+import logging
+
+import cv2
+import numpy as np
+
+from utils.media import load_audio, AUDIO_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of each signal in the combined intensity
+MOTION_SIGNAL_WEIGHTS = {
+    'frame_diff': 0.3,
+    'flow': 0.3,
+    'luma_var': 0.1,
+    'colour_var': 0.1,
+    'audio_rms': 0.2
+}
+
+
+def _frame_signals(small_bgr, prev_gray):
+    """Cheap per-frame signals computed on a downscaled frame."""
+    gray = cv2.cvtColor(small_bgr, cv2.COLOR_BGR2GRAY)
+
+    if prev_gray is None:
+        diff = 0.0
+        flow_mag = 0.0
+    else:
+        diff = float(np.mean(cv2.absdiff(gray, prev_gray)))
+        flow = cv2.calcOpticalFlowFarneback(prev_gray, gray, None, 0.5, 2, 9, 2, 5, 1.1, 0)
+        flow_mag = float(np.mean(np.hypot(flow[..., 0], flow[..., 1])))
+
+    # Colourfulness (Hasler & Suesstrunk) from opponent colour channels
+    b, g, r = [c.astype(np.float32) for c in cv2.split(small_bgr)]
+    rg = r - g
+    yb = 0.5 * (r + g) - b
+    colour = float(np.hypot(rg.std(), yb.std()) + 0.3 * np.hypot(rg.mean(), yb.mean()))
+
+    return gray, (diff, flow_mag, float(gray.std()), colour)
+
+
+def _scene_means(times, values, scene_starts, scene_ends):
+    """Mean of per-sample values falling inside each scene, vectorized with bincount."""
+    scene_index = np.searchsorted(scene_starts, times, side='right') - 1
+    valid = (scene_index >= 0) & (times < scene_ends[np.clip(scene_index, 0, None)])
+    scene_index = scene_index[valid]
+    n = len(scene_starts)
+
+    counts = np.bincount(scene_index, minlength=n)
+    means = np.zeros((n, values.shape[1]))
+    for k in range(values.shape[1]):
+        sums = np.bincount(scene_index, weights=values[valid, k], minlength=n)
+        means[:, k] = np.divide(sums, counts, out=np.zeros(n), where=counts > 0)
+    return means, counts
+
+
+def _audio_rms(video_path, scene_starts, scene_ends):
+    """Per-scene RMS loudness from a prefix sum of squared samples."""
+    samples = load_audio(video_path)
+    if samples is None:
+        return None
+
+    energy = np.concatenate(([0.0], np.cumsum(samples.astype(np.float64) ** 2)))
+    lo = np.clip((scene_starts * AUDIO_SAMPLE_RATE).astype(int), 0, len(samples))
+    hi = np.clip((scene_ends * AUDIO_SAMPLE_RATE).astype(int), 0, len(samples))
+    length = np.maximum(hi - lo, 1)
+    return np.sqrt((energy[hi] - energy[lo]) / length)
+
+
+def _normalize(column):
+    low, high = np.min(column), np.max(column)
+    if high - low <= 1e-12:
+        return np.zeros_like(column)
+    return (column - low) / (high - low)
+
+
+class MotionSignalCollector:
+    """
+    Collects per-frame motion signals from a frame stream.
+
+    Frames are sampled at sample_fps and downscaled to analysis_width; the
+    scene boundaries are only needed afterwards, in score_scenes(), so the
+    collector can share a decoding pass with the scene detector.
+    """
+
+    def __init__(self, analysis_width=160, sample_fps=10.0):
+        self.analysis_width = analysis_width
+        self.sample_interval = 1.0 / sample_fps if sample_fps else 0.0
+        self._next_sample_time = None
+        self._prev_gray = None
+        self._times = []
+        self._rows = []
+
+    def wants(self, timestamp):
+        """Whether the frame at this timestamp will be sampled."""
+        return self._next_sample_time is None or timestamp >= self._next_sample_time - 1e-6
+
+    def add_frame(self, timestamp, frame):
+        if not self.wants(timestamp):
+            return
+        self._next_sample_time = timestamp + self.sample_interval
+
+        height, width = frame.shape[:2]
+        scale = self.analysis_width / float(width)
+        small = cv2.resize(frame, (self.analysis_width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+        self._prev_gray, signals = _frame_signals(small, self._prev_gray)
+        self._times.append(timestamp)
+        self._rows.append(signals)
+
+    def score_scenes(self, video_path, scene_times, top_k=5, use_audio=True, weights=None):
+        """
+        Combine the collected signals into per-scene intensities.
+
+        Returns:
+        - List of dicts with {'scene', 'start_time', 'end_time', 'intensity', 'signals'}, most intense first
+        """
+        if not scene_times or not self._rows:
+            return []
+        weights = dict(MOTION_SIGNAL_WEIGHTS, **(weights or {}))
+
+        scene_starts = np.array([float(s) for s, _ in scene_times])
+        scene_ends = np.array([float(e) for _, e in scene_times])
+        order = np.argsort(scene_starts, kind='stable')
+
+        means, counts = _scene_means(np.array(self._times), np.array(self._rows),
+                                     scene_starts[order], scene_ends[order])
+        # Back to the caller's scene order
+        signal_means = np.zeros_like(means)
+        signal_means[order] = means
+        sample_counts = np.zeros_like(counts)
+        sample_counts[order] = counts
+
+        names = ['frame_diff', 'flow', 'luma_var', 'colour_var']
+        columns = {name: signal_means[:, k] for k, name in enumerate(names)}
+
+        if use_audio:
+            rms = _audio_rms(video_path, scene_starts, scene_ends)
+            if rms is not None:
+                columns['audio_rms'] = rms
+
+        total_weight = sum(weights[name] for name in columns)
+        combined = sum(weights[name] * _normalize(columns[name]) for name in columns) / total_weight
+
+        intensity_scores = []
+        for i, (start_time, end_time) in enumerate(scene_times):
+            if sample_counts[i]:
+                intensity_scores.append({
+                    'scene': i + 1,
+                    'start_time': start_time,
+                    'end_time': end_time,
+                    'intensity': float(combined[i]),
+                    'signals': {name: float(values[i]) for name, values in columns.items()}
+                })
+
+        # Sort by intensity for selecting top highlights
+        intensity_scores.sort(key=lambda x: x['intensity'], reverse=True)
+        return intensity_scores[:top_k] if top_k else intensity_scores
+
+
+def analyze_motion_intensity(video_path, scene_times, top_k=5, analysis_width=160, sample_fps=10.0,
+                             use_audio=True, weights=None):
+    """
+    Analyze scene intensity from motion, variance and loudness signals.
+
+    A CPU-only alternative to the ResNet engine: the video is decoded once,
+    frames are sampled at sample_fps and downscaled to analysis_width, and
+    per-scene means of frame-difference energy, optical-flow magnitude,
+    luminance and colour variance are combined with audio RMS loudness.
+
+    Parameters:
+    - video_path: Path to the video file
+    - scene_times: List of (start_time, end_time) tuples in seconds
+    - top_k: Number of most intense scenes to return (None = all)
+    - analysis_width: Width in pixels frames are downscaled to
+    - sample_fps: Frames per second analysed (None = every frame)
+    - use_audio: Include audio RMS loudness
+    - weights: Optional override of MOTION_SIGNAL_WEIGHTS
+
+    Returns:
+    - List of dicts with {'scene', 'start_time', 'end_time', 'intensity', 'signals'}, most intense first
+    """
+    if not scene_times:
+        return []
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        logger.error(f"Could not open video: {video_path}")
+        return []
+
+    collector = MotionSignalCollector(analysis_width=analysis_width, sample_fps=sample_fps)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_index = 0
+    try:
+        while True:
+            timestamp = frame_index / fps
+            # Skipped frames are decoded but never converted
+            if not collector.wants(timestamp):
+                if not cap.grab():
+                    break
+                frame_index += 1
+                continue
+
+            success, frame = cap.read()
+            if not success:
+                break
+            collector.add_frame(timestamp, frame)
+            frame_index += 1
+    finally:
+        cap.release()
+
+    return collector.score_scenes(video_path, scene_times, top_k=top_k, use_audio=use_audio, weights=weights)
@@ -0,0 +1,170 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineError(Exception):
+    """Raised when a required stage fails or the stage graph is invalid."""
+
+    def __init__(self, message, stage=None):
+        super().__init__(message)
+        self.stage = stage
+
+
+class Stage:
+    """
+    One step of a pipeline.
+
+    Parameters:
+    - name: Unique stage name
+    - func: Callable taking the declared inputs as keyword arguments and
+      returning a dict with (at least) the declared outputs
+    - inputs: Names of the values the stage needs
+    - outputs: Names of the values the stage produces
+    - fallback: dict of output values to use if the stage fails; a stage
+      with a fallback is optional and its failure does not fail the pipeline
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), fallback=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.fallback = fallback
+
+    @property
+    def optional(self):
+        return self.fallback is not None
+
+
+class Pipeline:
+    """
+    Graph of stages linked by their declared inputs and outputs.
+
+    A stage starts as soon as every value it needs is available, so
+    independent branches (e.g. audio and video analysis) run concurrently on a
+    thread pool. When an optional stage fails its fallback outputs are used
+    and the stages after it still run; when a required stage fails no new
+    stages are started and PipelineError is raised once running ones finish.
+    """
+
+    def __init__(self, stages=(), max_workers=4, meter=None):
+        self.stages = []
+        self.max_workers = max_workers
+        self.meter = meter
+        for stage in stages:
+            self.add(stage)
+
+    def add(self, stage):
+        if any(existing.name == stage.name for existing in self.stages):
+            raise PipelineError(f"Duplicate stage name: {stage.name}", stage.name)
+        self.stages.append(stage)
+        return stage
+
+    def _validate(self, initial):
+        """Check every input has exactly one producer and the graph has no cycles."""
+        producers = {name: None for name in initial}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in producers:
+                    raise PipelineError(f"Value '{output}' is produced twice", stage.name)
+                producers[output] = stage.name
+
+        for stage in self.stages:
+            missing = [name for name in stage.inputs if name not in producers]
+            if missing:
+                raise PipelineError(f"Stage {stage.name} needs unknown inputs {missing}", stage.name)
+
+        # Kahn's algorithm over the stage dependencies
+        available = set(initial)
+        remaining = list(self.stages)
+        while remaining:
+            ready = [stage for stage in remaining if all(name in available for name in stage.inputs)]
+            if not ready:
+                raise PipelineError(f"Cycle between stages {[stage.name for stage in remaining]}")
+            for stage in ready:
+                available.update(stage.outputs)
+                remaining.remove(stage)
+
+    def _run_stage(self, stage, kwargs, on_stage_start, measurements):
+        if on_stage_start:
+            on_stage_start(stage.name)
+        if self.meter is None:
+            result = stage.func(**kwargs) or {}
+        else:
+            # Measured in the stage's own thread so per-thread counters are meaningful
+            meter = self.meter(stage.name)
+            try:
+                with meter:
+                    result = stage.func(**kwargs) or {}
+            finally:
+                measurements[stage.name] = meter.metrics
+        missing = [name for name in stage.outputs if name not in result]
+        if missing:
+            raise PipelineError(f"Stage {stage.name} did not return {missing}", stage.name)
+        return {name: result[name] for name in stage.outputs}
+
+    def run(self, initial=None, on_stage_start=None, on_stage_end=None):
+        """
+        Run every stage.
+
+        Parameters:
+        - initial: dict of input values available before any stage runs
+        - on_stage_start: Optional callback(stage_name) called in the stage's thread
+        - on_stage_end: Optional callback(stage_name, report) called when a stage finishes
+
+        Returns:
+        - (values, report): all produced values, and per stage a dict with
+          'status' ('ok' or 'failed'), 'started_at', 'duration', 'error' and,
+          when the pipeline has a meter, its 'metrics'
+        """
+        values = dict(initial or {})
+        self._validate(values)
+
+        pending = list(self.stages)
+        running = {}
+        report = {}
+        measurements = {}
+        failure = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage') as executor:
+            while pending or running:
+                # Start every stage whose inputs are all available
+                if failure is None:
+                    for stage in [stage for stage in pending if all(name in values for name in stage.inputs)]:
+                        pending.remove(stage)
+                        started_at = time.time()
+                        kwargs = {name: values[name] for name in stage.inputs}
+                        future = executor.submit(self._run_stage, stage, kwargs, on_stage_start, measurements)
+                        running[future] = (stage, started_at)
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, started_at = running.pop(future)
+                    entry = {'status': 'ok', 'started_at': started_at, 'duration': time.time() - started_at, 'error': None}
+                    try:
+                        values.update(future.result())
+                    except Exception as e:
+                        entry['status'] = 'failed'
+                        entry['error'] = str(e)
+                        if stage.optional:
+                            logger.error(f"Stage {stage.name} failed, continuing without it: {str(e)}")
+                            values.update({name: stage.fallback.get(name) for name in stage.outputs})
+                        else:
+                            logger.error(f"Stage {stage.name} failed: {str(e)}")
+                            if failure is None:
+                                failure = PipelineError(f"Stage {stage.name} failed: {str(e)}", stage.name)
+                                failure.__cause__ = e
+                    if stage.name in measurements:
+                        entry['metrics'] = measurements[stage.name]
+                    report[stage.name] = entry
+                    if on_stage_end:
+                        on_stage_end(stage.name, entry)
+
+        if failure is not None:
+            raise failure
+        return values, report
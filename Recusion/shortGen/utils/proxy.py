@@ -0,0 +1,85 @@
+import logging
+import os
+import subprocess
+
+from utils.media import FFMPEG_BIN, AUDIO_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Analysis proxy: every analysis stage decodes this instead of the upload
+PROXY_HEIGHT = int(os.environ.get('PROXY_HEIGHT', 360))
+PROXY_FPS = float(os.environ.get('PROXY_FPS', 15))
+PROXY_FILENAME = 'analysis_proxy.mkv'
+# Optional ffmpeg -hwaccel value for decoding the source (e.g. 'auto', 'cuda', 'videotoolbox')
+PROXY_HWACCEL = os.environ.get('PROXY_HWACCEL', '')
+
+# Sources at most this much larger than the proxy are analysed directly
+PROXY_MIN_SCALE = 1.5
+
+
+def needs_proxy(video_info, height=PROXY_HEIGHT, fps=PROXY_FPS):
+    """Whether decoding a proxy saves work compared to analysing the source as is."""
+    source_height = video_info.get('height') or 0
+    source_fps = video_info.get('fps') or 0
+    return source_height > height * PROXY_MIN_SCALE or source_fps > fps * PROXY_MIN_SCALE * 2
+
+
+def make_proxy(video_path, proxy_path, height=PROXY_HEIGHT, fps=PROXY_FPS, hwaccel=PROXY_HWACCEL):
+    """
+    Transcode a low-resolution, low-frame-rate copy of a video for analysis.
+
+    The proxy keeps the source timeline (so scene times apply to the
+    original), is encoded for fast decoding, and carries the first audio
+    track as 16 kHz mono PCM. It is written to a temporary name and moved
+    into place, so an existing proxy_path is always complete.
+
+    Returns:
+    - proxy_path
+    """
+    tmp_path = f"{proxy_path}.{os.getpid()}.tmp.mkv"
+    cmd = [FFMPEG_BIN, '-nostdin', '-y', '-v', 'error']
+    if hwaccel:
+        cmd += ['-hwaccel', hwaccel]
+    cmd += [
+        '-i', video_path,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        # Never upscale; -2 keeps the width even for the encoder
+        '-vf', f"fps={fps},scale=-2:'min({height},ih)'",
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'fastdecode', '-crf', '28',
+        '-pix_fmt', 'yuv420p',
+        '-c:a', 'pcm_s16le', '-ac', '1', '-ar', str(AUDIO_SAMPLE_RATE),
+        tmp_path
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(f"Proxy transcode failed: {e.stderr.decode(errors='ignore').strip()}") from e
+    os.replace(tmp_path, proxy_path)
+    return proxy_path
+
+
+def ensure_proxy(video_path, video_info, job_folder):
+    """
+    Return the file the analysis stages should decode.
+
+    The proxy lives in the job folder, so a rerun of the job reuses it. Small
+    sources are returned unchanged, and so is the source if the proxy
+    cannot be made.
+    """
+    if not needs_proxy(video_info):
+        return video_path
+
+    proxy_path = os.path.join(job_folder, PROXY_FILENAME)
+    if os.path.exists(proxy_path):
+        logger.info("Reusing analysis proxy")
+        return proxy_path
+
+    try:
+        make_proxy(video_path, proxy_path)
+    except RuntimeError as e:
+        logger.error(f"Analysing the original instead: {str(e)}")
+        return video_path
+    logger.info(f"Analysis proxy created ({PROXY_HEIGHT}p, {PROXY_FPS:g} fps)")
+    return proxy_path
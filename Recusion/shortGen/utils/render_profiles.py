@@ -0,0 +1,87 @@
+import os
+
+# Encoder used for full re-encodes: 'libx264' (software) or a hardware H.264
+# encoder ffmpeg was built with ('h264_nvenc', 'h264_qsv', 'h264_videotoolbox')
+RENDER_ENCODER = os.environ.get('RENDER_ENCODER', 'libx264')
+SOFTWARE_ENCODER = 'libx264'
+
+# Named render profiles. 'speed' and 'quality' (x264 CRF scale, lower is
+# better) are encoder-neutral and translated by encoder_args(); 'filters' set
+# means the clip is always re-encoded, None keeps copy / smart cuts.
+RENDER_PROFILES = {
+    # Fast look at the selection, rendered when a highlight's preview is first downloaded
+    'preview': {
+        'filters': "scale=-2:'min(360,ih)'",
+        'speed': 'fast',
+        'quality': 30,
+        'audio_bitrate': '64k',
+        'filename': 'highlight_{n}_preview.mp4'
+    },
+    # Vertical 9:16 for Shorts / Reels: centre crop, then 1080x1920
+    'publish': {
+        'filters': "crop='min(iw,ih*9/16)':'min(ih,iw*16/9)',scale=1080:1920,setsar=1",
+        'speed': 'balanced',
+        'quality': 21,
+        'audio_bitrate': '128k',
+        'filename': 'highlight_{n}.mp4'
+    },
+    # Source resolution and codec, stream copied wherever the keyframes allow
+    'archive': {
+        'filters': None,
+        'speed': 'slow',
+        'quality': 18,
+        'audio_bitrate': '192k',
+        'filename': 'highlight_{n}.mp4'
+    }
+}
+DEFAULT_RENDER_PROFILE = os.environ.get('DEFAULT_RENDER_PROFILE', 'archive')
+
+# Encoder-neutral speed -> each encoder's preset names
+ENCODER_PRESETS = {
+    'libx264': {'fast': 'ultrafast', 'balanced': 'medium', 'slow': 'slow'},
+    'h264_nvenc': {'fast': 'p1', 'balanced': 'p4', 'slow': 'p6'},
+    'h264_qsv': {'fast': 'veryfast', 'balanced': 'medium', 'slow': 'slower'},
+    'h264_videotoolbox': {}
+}
+
+
+def encoder_args(speed, quality, encoder=RENDER_ENCODER):
+    """
+    ffmpeg video codec arguments for an encoder-neutral speed and quality.
+
+    Parameters:
+    - speed: 'fast', 'balanced' or 'slow'
+    - quality: Constant quality on the x264 CRF scale (0-51, lower is better)
+    - encoder: ffmpeg H.264 encoder name
+
+    Returns:
+    - List of arguments starting with -c:v
+    """
+    if encoder not in ENCODER_PRESETS:
+        raise ValueError(f"Unsupported encoder {encoder}, expected one of {list(ENCODER_PRESETS)}")
+
+    preset = ENCODER_PRESETS[encoder].get(speed)
+    if encoder == 'h264_nvenc':
+        return ['-c:v', encoder, '-preset', preset, '-rc', 'vbr', '-cq', str(quality), '-b:v', '0',
+                '-pix_fmt', 'yuv420p']
+    if encoder == 'h264_qsv':
+        return ['-c:v', encoder, '-preset', preset, '-global_quality', str(quality), '-pix_fmt', 'nv12']
+    if encoder == 'h264_videotoolbox':
+        # -q:v runs 1-100, higher is better
+        return ['-c:v', encoder, '-q:v', str(max(1, min(100, 100 - 2 * quality))), '-pix_fmt', 'yuv420p']
+    return ['-c:v', encoder, '-preset', preset, '-crf', str(quality), '-pix_fmt', 'yuv420p']
+
+
+def profile_args(name, encoder=RENDER_ENCODER):
+    """cut_clip keyword arguments (filters, encoder_args, audio_args) for a render profile."""
+    profile = RENDER_PROFILES[name]
+    return {
+        'filters': profile['filters'],
+        'encoder_args': encoder_args(profile['speed'], profile['quality'], encoder),
+        'audio_args': ['-b:a', profile['audio_bitrate']]
+    }
+
+
+def highlight_filename(name, index):
+    """File name of the index-th (0-based) highlight rendered with a profile."""
+    return RENDER_PROFILES[name]['filename'].format(n=index + 1)
@@ -0,0 +1,214 @@
+import logging
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from utils.clip_cutter import cut_clip
+from utils.render_profiles import (DEFAULT_RENDER_PROFILE, RENDER_ENCODER, SOFTWARE_ENCODER, highlight_filename,
+                                   profile_args)
+
+try:
+    import fcntl
+except ImportError:  # Windows: slots are only enforced within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Concurrent encodes allowed on this machine, across all jobs and processes
+MAX_CONCURRENT_ENCODES = int(os.environ.get('MAX_CONCURRENT_ENCODES', max(1, (os.cpu_count() or 4) // 4)))
+ENCODE_SLOTS_DIR = os.path.join('temp', 'encode_slots')
+
+# Minimum change in a highlight's progress before it is reported again
+PROGRESS_STEP = 0.05
+
+
+def encode_threads(max_slots=MAX_CONCURRENT_ENCODES):
+    """Encoder threads per encode so that a full set of slots uses every core once."""
+    return max(1, (os.cpu_count() or 2) // max(1, max_slots))
+
+
+class EncodeSlots:
+    """
+    Machine-wide counting semaphore for encodes, built on file locks.
+
+    Each slot is a lock file; holding an exclusive lock on one of them is a
+    licence to run one encode. Locks are released by the OS if the holder
+    dies, so a crashed worker never leaks a slot.
+    """
+
+    def __init__(self, lock_dir=ENCODE_SLOTS_DIR, max_slots=MAX_CONCURRENT_ENCODES, poll_interval=0.2):
+        self.lock_dir = lock_dir
+        self.max_slots = max(1, int(max_slots))
+        self.poll_interval = poll_interval
+        self._local = threading.BoundedSemaphore(self.max_slots)
+        os.makedirs(lock_dir, exist_ok=True)
+
+    @contextmanager
+    def acquire(self):
+        with self._local:
+            if fcntl is None:
+                yield None
+                return
+
+            while True:
+                for slot in range(self.max_slots):
+                    handle = open(os.path.join(self.lock_dir, f"slot_{slot}.lock"), 'w')
+                    try:
+                        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        handle.close()
+                        continue
+                    try:
+                        yield slot
+                    finally:
+                        fcntl.flock(handle, fcntl.LOCK_UN)
+                        handle.close()
+                    return
+                time.sleep(self.poll_interval)
+
+
+def cut_with_profile(planner, start, end, output_path, profile, threads, progress_callback=None):
+    """
+    Cut one clip with a render profile.
+
+    The clip is written under a temporary name and moved into place, so a file
+    at output_path is always complete. If a hardware encoder is configured and
+    fails (no device, driver mismatch), the clip is encoded in software instead.
+
+    Returns:
+    - cut_clip result dict
+    """
+    root, ext = os.path.splitext(output_path)
+    tmp_path = f"{root}.{os.getpid()}.{threading.get_ident()}.tmp{ext}"
+    try:
+        try:
+            cut = cut_clip(planner, start, end, tmp_path, threads=threads, progress_callback=progress_callback,
+                           **profile_args(profile))
+        except subprocess.CalledProcessError as e:
+            if RENDER_ENCODER == SOFTWARE_ENCODER:
+                raise
+            logger.warning(f"{RENDER_ENCODER} encode failed ({e.stderr.decode(errors='ignore').strip()}), "
+                           f"using {SOFTWARE_ENCODER}")
+            cut = cut_clip(planner, start, end, tmp_path, threads=threads, progress_callback=progress_callback,
+                           **profile_args(profile, SOFTWARE_ENCODER))
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return cut
+
+
+# Per-file locks of this process; the lock files extend them to other processes
+_render_locks = {}
+_render_locks_guard = threading.Lock()
+
+
+@contextmanager
+def render_lock(output_path):
+    """
+    Exclusive lock on rendering one output file, across threads and processes.
+
+    Callers that find the file missing take the lock, then check again: the
+    first one renders, the rest wait and find the finished file.
+    """
+    with _render_locks_guard:
+        local = _render_locks.setdefault(os.path.abspath(output_path), threading.Lock())
+    with local:
+        if fcntl is None:
+            yield
+            return
+        directory, filename = os.path.split(output_path)
+        with open(os.path.join(directory, f".{filename}.lock"), 'w') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def render_highlight(planner, start, end, output_path, profile=DEFAULT_RENDER_PROFILE, slots=None, threads=None):
+    """Render a single highlight on demand, waiting for a free encode slot."""
+    slots = slots or EncodeSlots()
+    threads = threads or encode_threads(slots.max_slots)
+    with slots.acquire():
+        logger.info(f"Rendering {os.path.basename(output_path)} ({profile}) from {start:.2f}s to {end:.2f}s")
+        return cut_with_profile(planner, start, end, output_path, profile, threads)
+
+
+def render_highlights(planner, segments, output_dir, on_progress=None, slots=None, threads=None,
+                      profile=DEFAULT_RENDER_PROFILE):
+    """
+    Render the highlights of one job concurrently.
+
+    Every highlight is submitted at once; the encode slots decide how many run
+    at the same time on this machine.
+
+    Parameters:
+    - planner: CutPlanner for the source video
+    - segments: List of (start_time, end_time) tuples
+    - output_dir: Folder receiving the highlights, named by the profile (e.g. highlight_<n>.mp4)
+    - on_progress: Optional callable receiving the per-highlight progress list whenever it changes
+    - slots: EncodeSlots shared by all renders (default: a machine-wide instance)
+    - threads: Encoder threads per encode (default: tuned to the slot count)
+    - profile: Name of the render profile (see utils.render_profiles)
+
+    Returns:
+    - List of dicts with {'filename', 'path', 'start_time', 'end_time', 'method'}, in segment order;
+      start_time is where the cut actually starts (a copy cut starts on a keyframe)
+    """
+    slots = slots or EncodeSlots()
+    threads = threads or encode_threads(slots.max_slots)
+
+    progress = [
+        {'filename': highlight_filename(profile, i), 'status': 'queued', 'progress': 0.0}
+        for i in range(len(segments))
+    ]
+    lock = threading.Lock()
+
+    def report(index, status=None, fraction=None):
+        with lock:
+            entry = progress[index]
+            changed = status is not None and status != entry['status']
+            if status is not None:
+                entry['status'] = status
+            if fraction is not None and (fraction - entry['progress'] >= PROGRESS_STEP or fraction >= 1.0):
+                entry['progress'] = round(fraction, 3)
+                changed = True
+            snapshot = [dict(item) for item in progress] if changed else None
+        if snapshot is not None and on_progress is not None:
+            on_progress(snapshot)
+
+    def render(index):
+        start, end = segments[index]
+        filename = progress[index]['filename']
+        output_path = os.path.join(output_dir, filename)
+
+        with slots.acquire():
+            report(index, status='rendering')
+            logger.info(f"Creating highlight {index+1} ({profile}) from {start:.2f}s to {end:.2f}s")
+            try:
+                cut = cut_with_profile(planner, start, end, output_path, profile, threads,
+                                       progress_callback=lambda fraction: report(index, fraction=fraction))
+            except Exception:
+                report(index, status='failed')
+                raise
+        report(index, status='complete', fraction=1.0)
+        logger.info(f"Highlight {index+1} written via {cut['method']} cut")
+
+        return {
+            'filename': filename,
+            'path': output_path,
+            'start_time': cut['start_time'],
+            'end_time': cut['end_time'],
+            'method': cut['method']
+        }
+
+    if not segments:
+        return []
+
+    with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+        futures = [executor.submit(render, i) for i in range(len(segments))]
+        return [future.result() for future in futures]
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+CACHE_FOLDER = os.environ.get('CACHE_FOLDER', 'cache')
+CACHE_MAX_MB = int(os.environ.get('CACHE_MAX_MB', 2048))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def save_and_hash(stream, file_path, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Copy an upload stream to disk, hashing it on the way.
+
+    Returns:
+    - SHA-256 hex digest of the content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'wb') as f:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of analysis results on disk.
+
+    Entries are JSON documents keyed by the source file's hash plus whatever
+    analysis parameters affect them. A SQLite index tracks entry sizes and last
+    access so the least recently used entries are evicted once the cache grows
+    past max_mb, and keeps hit/miss counters shared by all processes.
+    """
+
+    def __init__(self, cache_dir=CACHE_FOLDER, max_mb=CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, 'index.db')
+        self._init_index()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_index(self):
+        conn = self._connect()
+        try:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        finally:
+            conn.close()
+
+    def _path(self, key):
+        safe_key = key.replace(':', '_')
+        return os.path.join(self.cache_dir, safe_key[:2], f"{safe_key}.json")
+
+    def _count(self, conn, name):
+        conn.execute(
+            'INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1',
+            (name,)
+        )
+
+    def get(self, key):
+        """Return the cached document for key, or None on a miss."""
+        path = self._path(key)
+        conn = self._connect()
+        try:
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                self._count(conn, 'misses')
+                conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                return None
+
+            self._count(conn, 'hits')
+            conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+            return data
+        finally:
+            conn.close()
+
+    def put(self, key, data):
+        """Store a JSON-serialisable document under key and evict old entries if over budget."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)',
+                (key, os.path.getsize(path), time.time())
+            )
+            self._evict(conn)
+        finally:
+            conn.close()
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY last_access ASC').fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._count(conn, 'evictions')
+            total -= size
+            logger.info(f"Evicted cache entry {key}")
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            counters = dict(conn.execute('SELECT name, value FROM counters').fetchall())
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        finally:
+            conn.close()
+        return {
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'evictions': counters.get('evictions', 0),
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes
+        }
@@ -3,42 +3,135 @@ import torchvision.transforms as transforms
 from PIL import Image
 import cv2
 import numpy as np
-from torchvision import models
 
-def analyze_scene_intensity(video_path, scene_times):
-    """Analyze scene intensity using ResNet model."""
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
-    model = models.resnet50(pretrained=True).to(device)
-    model.eval()
+from utils.model_registry import registry
+from utils.frame_stream import iter_scene_frames, scene_sample_times
 
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-    ])
+# Frames are reduced to the network input size as soon as they are sampled
+RESNET_INPUT_SIZE = (224, 224)
 
-    intensity_scores = []
 
-    for i, (start_time, end_time) in enumerate(scene_times):
-        cap = cv2.VideoCapture(video_path)
-        cap.set(cv2.CAP_PROP_POS_MSEC, start_time * 1000)
-        success, frame = cap.read()
+class ResnetBatchScorer:
+    """
+    Accumulates sampled scene frames and scores them with ResNet in batches.
 
-        if success:
-            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            img_tensor = transform(img).unsqueeze(0).to(device)
+    A scene's intensity is the mean feature norm over its sampled frames.
+    """
 
-            with torch.no_grad():
-                features = model(img_tensor)
-                score = features.norm().item()  # Normalize as intensity score
+    def __init__(self, batch_size=32):
+        self.batch_size = batch_size
+        self.model = registry.get('resnet50')
+        self.device = next(self.model.parameters()).device
+        self.transform = transforms.Compose([
+            transforms.Resize(RESNET_INPUT_SIZE),
+            transforms.ToTensor(),
+        ])
+        self.totals = {}
+        self.counts = {}
+        self._batch_scenes = []
+        self._batch_tensors = []
+
+    def add(self, scene_index, frame):
+        """Queue a BGR frame belonging to a scene; runs a forward pass when the batch is full."""
+        img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        self._batch_scenes.append(scene_index)
+        self._batch_tensors.append(self.transform(img))
+        if len(self._batch_tensors) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._batch_tensors:
+            return
+        with torch.no_grad():
+            features = self.model(torch.stack(self._batch_tensors).to(self.device))
+            # Per-frame feature norm, as the single-frame version computed
+            scores = torch.linalg.vector_norm(features, dim=1).cpu().numpy()
+        for scene_index, score in zip(self._batch_scenes, scores):
+            self.totals[scene_index] = self.totals.get(scene_index, 0.0) + float(score)
+            self.counts[scene_index] = self.counts.get(scene_index, 0) + 1
+        self._batch_scenes, self._batch_tensors = [], []
+
+    def results(self, scene_times, top_k=5):
+        """Return the scored scenes, most intense first."""
+        self.flush()
+        intensity_scores = []
+        for i, (start_time, end_time) in enumerate(scene_times):
+            if self.counts.get(i):
                 intensity_scores.append({
                     'scene': i + 1,
                     'start_time': start_time,
                     'end_time': end_time,
-                    'intensity': score
+                    'intensity': self.totals[i] / self.counts[i]
                 })
 
-        cap.release()
+        # Sort by intensity for selecting top highlights
+        intensity_scores.sort(key=lambda x: x['intensity'], reverse=True)
+        return intensity_scores[:top_k] if top_k else intensity_scores
+
+
+class StreamingSceneSampler:
+    """
+    Picks each scene's sample frames from a live frame stream.
+
+    Used when scenes are detected in the same decoding pass, so scene ends are
+    not known while frames go by. The first frame of a scene is always kept;
+    for more than one frame per scene, downscaled candidates are kept at an
+    interval that doubles whenever too many accumulate, and the ones nearest
+    the evenly spaced sample times are scored when the scene closes.
+    """
+
+    def __init__(self, scorer, frames_per_scene=1, candidate_interval=0.25):
+        self.scorer = scorer
+        self.frames_per_scene = frames_per_scene
+        self.initial_interval = candidate_interval
+        self._reset()
+
+    def _reset(self):
+        self._candidates = []
+        self._interval = self.initial_interval
+        self._next_candidate_time = None
+
+    def add_frame(self, timestamp, frame):
+        if self._next_candidate_time is not None and (
+                self.frames_per_scene == 1 or timestamp < self._next_candidate_time):
+            return
+
+        small = cv2.resize(frame, RESNET_INPUT_SIZE, interpolation=cv2.INTER_AREA)
+        self._candidates.append((timestamp, small))
+        self._next_candidate_time = timestamp + self._interval
+
+        # Bound memory: keep the scene start, thin out the rest
+        if len(self._candidates) > 4 * self.frames_per_scene:
+            self._candidates = self._candidates[:1] + self._candidates[2::2]
+            self._interval *= 2
+
+    def close_scene(self, scene_index, start_time, end_time):
+        if self._candidates:
+            times = np.array([t for t, _ in self._candidates])
+            for target, _ in scene_sample_times([(start_time, end_time)], self.frames_per_scene):
+                nearest = int(np.argmin(np.abs(times - target)))
+                self.scorer.add(scene_index, self._candidates[nearest][1])
+        self._reset()
+
+
+def analyze_scene_intensity(video_path, scene_times, frames_per_scene=1, batch_size=32, top_k=5):
+    """
+    Analyze scene intensity using ResNet model.
+
+    The video is decoded once in timestamp order and the sampled frames are
+    scored in batches. A scene's intensity is the mean over its sampled frames.
+
+    Parameters:
+    - video_path: Path to the video file
+    - scene_times: List of (start_time, end_time) tuples in seconds
+    - frames_per_scene: Number of frames sampled per scene
+    - batch_size: Number of frames per ResNet forward pass
+    - top_k: Number of most intense scenes to return (None = all)
 
-    # Sort by intensity for selecting top highlights
-    intensity_scores.sort(key=lambda x: x['intensity'], reverse=True)
-    return intensity_scores[:5]  # Top 5 intense scenes
+    Returns:
+    - List of dicts with {'scene', 'start_time', 'end_time', 'intensity'}, most intense first
+    """
+    scorer = ResnetBatchScorer(batch_size=batch_size)
+    for scene_index, frame in iter_scene_frames(video_path, scene_times, frames_per_scene):
+        scorer.add(scene_index, frame)
+    return scorer.results(scene_times, top_k=top_k)
@@ -0,0 +1,146 @@
+import logging
+
+import numpy as np
+
+from utils.intervals import overlap_join
+
+logger = logging.getLogger(__name__)
+
+# Default weight of each signal in the combined highlight score
+DEFAULT_SIGNAL_WEIGHTS = {
+    'intensity': 0.6,
+    'sentiment': 0.4
+}
+
+
+def _as_intervals(starts, ends):
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    if starts.shape != ends.shape:
+        raise ValueError('starts and ends must have the same length')
+    return starts, ends
+
+
+def overlap_pairs(left_starts, left_ends, right_starts, right_ends):
+    """
+    All overlapping (left, right) index pairs between two interval columns.
+
+    When the right-hand intervals are disjoint (scenes, transcript windows)
+    the matches of each left interval are a contiguous run of the sorted
+    right intervals, found with two binary searches; otherwise the heap
+    sweep in overlap_join is used. Either way the cost is O((n + m) log m + k).
+
+    Returns:
+    - (left_idx, right_idx, overlap_seconds) arrays
+    """
+    left_starts, left_ends = _as_intervals(left_starts, left_ends)
+    right_starts, right_ends = _as_intervals(right_starts, right_ends)
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+    if left_starts.size == 0 or right_starts.size == 0:
+        return empty
+
+    order = np.argsort(right_starts, kind='stable')
+    sorted_starts, sorted_ends = right_starts[order], right_ends[order]
+
+    if np.all(sorted_starts[1:] >= sorted_ends[:-1]):
+        # Disjoint and sorted, so ends are sorted too
+        lo = np.searchsorted(sorted_ends, left_starts, side='right')
+        hi = np.searchsorted(sorted_starts, left_ends, side='left')
+        counts = np.maximum(hi - lo, 0)
+        left_idx = np.repeat(np.arange(left_starts.size), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        right_idx = order[np.repeat(lo, counts) + offsets]
+    else:
+        matches = overlap_join(list(zip(left_starts, left_ends)), list(zip(right_starts, right_ends)))
+        left_idx = np.array([i for i, row in enumerate(matches) for _ in row], dtype=np.int64)
+        right_idx = np.array([j for row in matches for j, _ in row], dtype=np.int64)
+        if left_idx.size == 0:
+            return empty
+
+    overlap = (np.minimum(left_ends[left_idx], right_ends[right_idx])
+               - np.maximum(left_starts[left_idx], right_starts[right_idx]))
+    keep = overlap > 0
+    return left_idx[keep], right_idx[keep], overlap[keep]
+
+
+def normalize(values):
+    """Min-max scale to [0, 1] (all zeros if the values are constant)."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return values
+    value_range = values.max() - values.min()
+    return (values - values.min()) / value_range if value_range > 0 else np.zeros_like(values)
+
+
+class ScoringEngine:
+    """
+    Columnar highlight scoring over any number of timed signals.
+
+    A signal is a set of intervals with one value each (scene intensity,
+    sentiment magnitude, loudness, ...) and a weight. Signals flagged as
+    candidate sources also contribute candidate highlights: every interval of
+    the first such signal, then intervals of later ones that overlap no
+    earlier candidate. Each candidate's score is the weighted sum, over
+    signals, of the overlap-weighted mean of the signal's normalised values.
+    """
+
+    def __init__(self):
+        self.signals = []
+
+    def add_signal(self, name, starts, ends, values, weight=1.0, candidates=True, normalise=True):
+        """
+        Parameters:
+        - name: Signal name, also the name of its column in the score table
+        - starts, ends, values: Equally long sequences, one entry per interval
+        - weight: Weight of the signal in the combined score
+        - candidates: Whether the signal's intervals are highlight candidates
+        - normalise: Min-max scale values to [0, 1] first
+        """
+        starts, ends = _as_intervals(starts, ends)
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape != starts.shape:
+            raise ValueError(f"Signal {name}: values must match the intervals")
+        self.signals.append({
+            'name': name,
+            'starts': starts,
+            'ends': ends,
+            'values': normalize(values) if normalise else values,
+            'weight': float(weight),
+            'candidates': candidates
+        })
+        return self
+
+    def candidates(self):
+        """Candidate intervals as (starts, ends) arrays."""
+        starts, ends = np.empty(0), np.empty(0)
+        for signal in self.signals:
+            if not signal['candidates'] or signal['starts'].size == 0:
+                continue
+            if starts.size:
+                covered, _, _ = overlap_pairs(signal['starts'], signal['ends'], starts, ends)
+                fresh = np.ones(signal['starts'].size, dtype=bool)
+                fresh[covered] = False
+            else:
+                fresh = slice(None)
+            starts = np.concatenate((starts, signal['starts'][fresh]))
+            ends = np.concatenate((ends, signal['ends'][fresh]))
+        return starts, ends
+
+    def score(self):
+        """
+        Score every candidate.
+
+        Returns:
+        - dict of equally long arrays: 'start_time', 'end_time', 'score' and one column per signal
+        """
+        starts, ends = self.candidates()
+        table = {'start_time': starts, 'end_time': ends, 'score': np.zeros(starts.size)}
+        for signal in self.signals:
+            cand_idx, sig_idx, overlap = overlap_pairs(starts, ends, signal['starts'], signal['ends'])
+            weighted = np.bincount(cand_idx, weights=signal['values'][sig_idx] * overlap, minlength=starts.size)
+            total = np.bincount(cand_idx, weights=overlap, minlength=starts.size)
+            column = np.divide(weighted, total, out=np.zeros(starts.size), where=total > 0)
+            table[signal['name']] = column
+            table['score'] += signal['weight'] * column
+        return table
+
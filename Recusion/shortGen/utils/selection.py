@@ -0,0 +1,182 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# How far (seconds) a clip edge may move to land on a scene cut
+SNAP_TOLERANCE = 2.0
+
+# Bisection steps when searching the runtime-budget penalty
+BUDGET_SEARCH_STEPS = 30
+
+
+def fit_durations(starts, ends, min_duration, max_duration, total_duration=None):
+    """
+    Vectorised duration fitting: extend short intervals and trim long ones
+    around their centre, then shift them back inside [0, total_duration].
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    middle = (starts + ends) / 2
+    duration = np.clip(ends - starts, min_duration, max_duration)
+    starts, ends = middle - duration / 2, middle + duration / 2
+
+    shift = np.maximum(0.0, -starts)
+    starts, ends = starts + shift, ends + shift
+    if total_duration is not None:
+        shift = np.maximum(0.0, ends - total_duration)
+        starts, ends = np.maximum(0.0, starts - shift), ends - shift
+    return starts, ends
+
+
+def snap_to_boundaries(starts, ends, boundaries, min_duration, max_duration, tolerance=SNAP_TOLERANCE):
+    """
+    Move clip edges onto the nearest scene boundary within tolerance, as long
+    as the clip stays within the duration limits.
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    boundaries = np.unique(np.asarray(boundaries, dtype=np.float64))
+    if boundaries.size == 0 or starts.size == 0:
+        return starts, ends
+
+    def nearest(values):
+        idx = np.searchsorted(boundaries, values)
+        left = boundaries[np.clip(idx - 1, 0, boundaries.size - 1)]
+        right = boundaries[np.clip(idx, 0, boundaries.size - 1)]
+        return np.where(values - left <= right - values, left, right)
+
+    snapped = nearest(starts)
+    duration = ends - snapped
+    ok = (np.abs(snapped - starts) <= tolerance) & (duration >= min_duration - 1e-9) & (duration <= max_duration + 1e-9)
+    starts = np.where(ok, snapped, starts)
+
+    snapped = nearest(ends)
+    duration = snapped - starts
+    ok = (np.abs(snapped - ends) <= tolerance) & (duration >= min_duration - 1e-9) & (duration <= max_duration + 1e-9)
+    ends = np.where(ok, snapped, ends)
+    return starts, ends
+
+
+def _schedule(starts, ends, weights, max_count, min_gap):
+    """
+    Weighted interval scheduling with at most max_count intervals.
+
+    Intervals are sorted by end; dp[c][i] is the best total weight using at
+    most c of the first i intervals. For a fixed c every "take interval i"
+    value depends only on row c - 1, so each row is one vectorised pass and
+    a running maximum: O(max_count * n) after an O(n log n) sort.
+
+    Returns:
+    - Indices (into the input arrays) of the chosen intervals
+    """
+    n = starts.size
+    if n == 0 or max_count <= 0:
+        return []
+
+    order = np.argsort(ends, kind='stable')
+    s, e, w = starts[order], ends[order], weights[order]
+    # Number of intervals (in end order) that finish at least min_gap before each one starts
+    compatible = np.searchsorted(e, s - min_gap, side='right')
+
+    rows = [np.zeros(n + 1)]
+    for _ in range(max_count):
+        previous = rows[-1]
+        take = previous[compatible] + w
+        row = np.empty(n + 1)
+        row[0] = 0.0
+        row[1:] = np.maximum.accumulate(np.maximum(take, previous[1:]))
+        rows.append(row)
+
+    # Walk back: the first position where a row reaches its value is where an interval was taken
+    chosen = []
+    c, i = max_count, n
+    while c > 0 and i > 0 and rows[c][i] > 0:
+        if rows[c][i] == rows[c - 1][i]:
+            c -= 1
+            continue
+        j = int(np.searchsorted(rows[c][:i + 1], rows[c][i], side='left'))  # 1-based position of the interval
+        chosen.append(int(order[j - 1]))
+        i = int(compatible[j - 1])
+        c -= 1
+    return chosen
+
+
+def select_intervals(starts, ends, scores, max_count, min_gap=0.0, max_total_duration=None):
+    """
+    Best-scoring set of non-overlapping intervals under count, gap and runtime limits.
+
+    Parameters:
+    - starts, ends, scores: Candidate columns (already fitted to the duration limits)
+    - max_count: Maximum number of intervals to pick
+    - min_gap: Minimum seconds between consecutive picks
+    - max_total_duration: Budget for the summed duration of the picks (None = unlimited)
+
+    The budget is handled by Lagrangian relaxation: every second of clip costs
+    a penalty, found by bisection, that is as small as possible while the
+    schedule fits the budget.
+
+    Returns:
+    - Indices of the chosen intervals, in time order; raises ValueError for a
+      negative min_gap (it would let picks overlap) or a non-positive budget
+    """
+    if min_gap < 0:
+        raise ValueError('min_gap must be >= 0')
+    if max_total_duration is not None and max_total_duration <= 0:
+        raise ValueError('max_total_duration must be > 0 (or None for no budget)')
+
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    durations = ends - starts
+    if scores.size == 0:
+        return []
+
+    chosen = _schedule(starts, ends, scores, max_count, min_gap)
+    if max_total_duration is not None and durations[chosen].sum() > max_total_duration:
+        # Any clip's score is below max(scores) / min(duration) per second, so this penalty drops everything
+        low, high = 0.0, float(scores.max()) / max(float(durations.min()), 1e-6) + 1.0
+        best = [i for i in chosen if durations[i] <= max_total_duration][:1]
+        for _ in range(BUDGET_SEARCH_STEPS):
+            penalty = (low + high) / 2
+            candidate = _schedule(starts, ends, scores - penalty * durations, max_count, min_gap)
+            if durations[candidate].sum() <= max_total_duration:
+                best, high = candidate, penalty
+            else:
+                low = penalty
+        chosen = best
+
+    return sorted(chosen, key=lambda i: starts[i])
+
+
+def plan_highlights(starts, ends, scores, num_highlights, min_duration, max_duration, total_duration,
+                    boundaries=(), min_gap=0.0, max_total_duration=None, snap_tolerance=SNAP_TOLERANCE):
+    """
+    Turn scored candidate segments into a non-overlapping highlight plan.
+
+    Candidates are fitted to [min_duration, max_duration], snapped to scene
+    boundaries where that keeps them within limits, and scheduled with
+    select_intervals. Every clip also earns a bonus larger than any score
+    difference, so the plan has as many clips as the constraints allow
+    (up to num_highlights) before the total score is maximised.
+
+    Returns:
+    - List of dicts with {'start_time', 'end_time', 'score'} in time order
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.size == 0:
+        return []
+
+    starts, ends = fit_durations(starts, ends, min_duration, max_duration, total_duration)
+    starts, ends = snap_to_boundaries(starts, ends, boundaries, min_duration, max_duration, snap_tolerance)
+    valid = ends > starts
+    starts, ends, scores = starts[valid], ends[valid], scores[valid]
+
+    spread = float(scores.max() - min(0.0, scores.min())) if scores.size else 0.0
+    bonus = num_highlights * spread + 1.0
+    chosen = select_intervals(starts, ends, scores + bonus, num_highlights, min_gap, max_total_duration)
+    return [
+        {'start_time': float(starts[i]), 'end_time': float(ends[i]), 'score': float(scores[i])}
+        for i in chosen
+    ]
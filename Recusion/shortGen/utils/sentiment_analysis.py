@@ -1,8 +1,8 @@
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from utils.model_registry import registry
 
 def analyze_sentiment(transcript):
     """Analyze sentiment using VADER model."""
-    analyzer = SentimentIntensityAnalyzer()
+    analyzer = registry.get('vader')
     sentiment_scores = []
     lines = transcript.split('.')
 
@@ -18,3 +18,53 @@ def analyze_sentiment(transcript):
     # Return top N emotionally intense lines
     sentiment_scores.sort(key=lambda x: abs(x['score']), reverse=True)
     return sentiment_scores[:5]
+
+def analyze_segment_sentiment(segments, window_seconds=10.0, top_k=5):
+    """
+    Analyze sentiment of timestamped transcript segments using VADER model.
+
+    Consecutive segments are grouped into windows of at least window_seconds
+    so each scored window carries enough text, and every window keeps the
+    real start/end time of its segments.
+
+    Parameters:
+    - segments: List of dicts with {'start', 'end', 'text'} (transcribe_audio() output)
+    - window_seconds: Minimum window length in seconds (0 = one window per segment)
+    - top_k: Number of most emotionally intense windows to return (None = all)
+
+    Returns:
+    - List of dicts with {'start_time', 'end_time', 'score', 'text'}, most intense (by |score|) first
+    """
+    analyzer = registry.get('vader')
+
+    windows = []
+    current = None
+    for segment in segments:
+        text = segment.get('text', '').strip()
+        if not text:
+            continue
+        if current is None:
+            current = {'start_time': segment['start'], 'end_time': segment['end'], 'texts': [text]}
+        else:
+            current['end_time'] = segment['end']
+            current['texts'].append(text)
+        if current['end_time'] - current['start_time'] >= window_seconds:
+            windows.append(current)
+            current = None
+    if current is not None:
+        windows.append(current)
+
+    sentiment_scores = []
+    for window in windows:
+        text = ' '.join(window['texts'])
+        sentiment = analyzer.polarity_scores(text)
+        sentiment_scores.append({
+            'start_time': window['start_time'],
+            'end_time': window['end_time'],
+            'score': sentiment['compound'],  # Compound sentiment score
+            'text': text
+        })
+
+    # Return top N emotionally intense windows
+    sentiment_scores.sort(key=lambda x: abs(x['score']), reverse=True)
+    return sentiment_scores[:top_k] if top_k else sentiment_scores
@@ -0,0 +1,169 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.media import AUDIO_SAMPLE_RATE
+from utils.model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+# Parallel transcription processes per worker (1 = transcribe in-process)
+TRANSCRIBE_WORKERS = int(os.environ.get('TRANSCRIBE_WORKERS', 2))
+WHISPER_MODEL = 'whisper-base'
+
+# Chunking: cut in silences, aiming for chunks between these lengths (seconds)
+MIN_CHUNK_SECONDS = 10.0
+MAX_CHUNK_SECONDS = 30.0
+MIN_SILENCE_SECONDS = 0.3
+SILENCE_FRAME_SECONDS = 0.02
+
+_pool = None
+_pool_workers = 0
+
+
+def find_silences(samples, sample_rate=AUDIO_SAMPLE_RATE, min_silence=MIN_SILENCE_SECONDS,
+                  frame_seconds=SILENCE_FRAME_SECONDS):
+    """
+    Return the midpoints (in samples) of every silent stretch of at least min_silence.
+
+    A frame is silent when its RMS is below 10% of the median frame RMS
+    (with an absolute floor), which adapts to the recording level.
+    """
+    frame = max(1, int(frame_seconds * sample_rate))
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return np.array([], dtype=int)
+
+    rms = np.sqrt(np.mean(samples[:n_frames * frame].reshape(n_frames, frame) ** 2, axis=1))
+    threshold = max(1e-4, 0.1 * float(np.median(rms)))
+    silent = np.concatenate(([False], rms < threshold, [False]))
+
+    # Run boundaries of the silent mask
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    run_starts, run_ends = edges[0::2], edges[1::2]
+    long_runs = (run_ends - run_starts) * frame >= min_silence * sample_rate
+    return ((run_starts[long_runs] + run_ends[long_runs]) // 2) * frame
+
+
+def split_on_silence(samples, sample_rate=AUDIO_SAMPLE_RATE, min_chunk=MIN_CHUNK_SECONDS,
+                     max_chunk=MAX_CHUNK_SECONDS):
+    """
+    Split audio into chunks of at most max_chunk seconds, cutting in silences where possible.
+
+    Returns:
+    - List of (start_sample, end_sample) tuples covering the whole signal
+    """
+    total = len(samples)
+    silences = find_silences(samples, sample_rate)
+    min_len, max_len = int(min_chunk * sample_rate), int(max_chunk * sample_rate)
+
+    chunks = []
+    start = 0
+    while total - start > max_len:
+        # Latest silence that keeps the chunk within [min_chunk, max_chunk]
+        lo = np.searchsorted(silences, start + min_len)
+        hi = np.searchsorted(silences, start + max_len, side='right')
+        end = int(silences[hi - 1]) if hi > lo else start + max_len
+        chunks.append((start, end))
+        start = end
+    if start < total:
+        chunks.append((start, total))
+    return chunks
+
+
+def _transcribe_chunk(samples, offset, model=None):
+    """Transcribe one chunk and shift its segment and word times by offset seconds."""
+    model = model or registry.get(WHISPER_MODEL)
+    result = model.transcribe(samples, word_timestamps=True, fp16=False)
+
+    segments = []
+    for segment in result.get('segments', []):
+        segments.append({
+            'start': round(offset + segment['start'], 3),
+            'end': round(offset + segment['end'], 3),
+            'text': segment['text'].strip(),
+            'words': [
+                {
+                    'word': word['word'].strip(),
+                    'start': round(offset + word['start'], 3),
+                    'end': round(offset + word['end'], 3),
+                    'probability': round(float(word.get('probability', 0.0)), 3)
+                }
+                for word in segment.get('words', [])
+            ]
+        })
+    return segments
+
+
+def _init_transcribe_worker():
+    registry.warm([WHISPER_MODEL])
+
+
+def _ready():
+    return True
+
+
+def _get_pool(workers):
+    """Process pool kept alive across jobs so each child loads Whisper only once."""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        # spawn: forking a process that already holds torch state is not safe
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_transcribe_worker
+        )
+        _pool_workers = workers
+    return _pool
+
+
+def warm_transcription(workers=TRANSCRIBE_WORKERS):
+    """
+    Load Whisper where transcribe_audio will use it: in this process for
+    workers <= 1, else only in the children of the transcription pool.
+    """
+    if workers <= 1:
+        registry.warm([WHISPER_MODEL])
+        return
+    # Submitting one task per child starts them all; each loads Whisper in its initializer
+    pool = _get_pool(workers)
+    for future in [pool.submit(_ready) for _ in range(workers)]:
+        future.result()
+
+
+def transcribe_audio(samples, sample_rate=AUDIO_SAMPLE_RATE, workers=TRANSCRIBE_WORKERS):
+    """
+    Transcribe 16 kHz mono samples in silence-delimited chunks, in parallel.
+
+    Parameters:
+    - samples: float32 numpy array from load_audio()
+    - sample_rate: Sample rate of the array (Whisper needs 16 kHz)
+    - workers: Number of transcription processes (1 = in-process); with more,
+      every chunk goes to the pool, so this process never loads Whisper
+
+    Returns:
+    - dict with 'text' and 'segments', a time-ordered list of
+      {'start', 'end', 'text', 'words': [{'word', 'start', 'end', 'probability'}]}
+    """
+    chunks = split_on_silence(samples, sample_rate)
+    logger.info(f"Transcribing {len(samples) / sample_rate:.1f}s of audio in {len(chunks)} chunks")
+
+    pieces = [(samples[start:end], start / sample_rate) for start, end in chunks]
+
+    if workers <= 1:
+        model = registry.get(WHISPER_MODEL)
+        results = [_transcribe_chunk(chunk, offset, model) for chunk, offset in pieces]
+    else:
+        pool = _get_pool(workers)
+        futures = [pool.submit(_transcribe_chunk, chunk, offset) for chunk, offset in pieces]
+        results = [future.result() for future in futures]
+
+    segments = sorted((segment for chunk_segments in results for segment in chunk_segments),
+                      key=lambda segment: segment['start'])
+    text = ' '.join(segment['text'] for segment in segments if segment['text'])
+    return {'text': text, 'segments': segments}
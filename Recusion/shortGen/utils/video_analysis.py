@@ -0,0 +1,72 @@
+import logging
+
+from utils.frame_stream import iter_frames
+from utils.scene_detect import ContentSceneDetector, DEFAULT_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+
+def analyze_video(video_path, intensity_engine='resnet', threshold=DEFAULT_THRESHOLD, frames_per_scene=1,
+                  batch_size=32, top_k=5):
+    """
+    Detect scenes and score their intensity in a single decoding pass.
+
+    Every decoded frame goes to the scene detector first; when it reports a
+    cut, the finished scene is handed to the intensity engine, which has been
+    sampling the same frames as they went by. Nothing is written to disk.
+
+    Parameters:
+    - video_path: Path to the video file
+    - intensity_engine: 'resnet' or 'motion'
+    - threshold: Content detector threshold (same scale as scenedetect's detect-content)
+    - frames_per_scene: Frames sampled per scene by the ResNet engine
+    - batch_size: Frames per ResNet forward pass
+    - top_k: Number of most intense scenes to return (None = all)
+
+    Returns:
+    - (scene_times, intensity_scores): list of (start_time, end_time) tuples in
+      order, and the scored scenes in analyze_scene_intensity() format
+    """
+    detector = ContentSceneDetector(threshold=threshold)
+    scene_times = []
+
+    if intensity_engine == 'motion':
+        from utils.motion_intensity import MotionSignalCollector
+        collector = MotionSignalCollector()
+        on_frame = collector.add_frame
+        on_scene = None
+    else:
+        from utils.scene_intensity import ResnetBatchScorer, StreamingSceneSampler
+        scorer = ResnetBatchScorer(batch_size=batch_size)
+        sampler = StreamingSceneSampler(scorer, frames_per_scene=frames_per_scene)
+        on_frame = sampler.add_frame
+        on_scene = sampler.close_scene
+
+    def close_scene(scene):
+        scene_times.append(scene)
+        if on_scene is not None:
+            on_scene(len(scene_times) - 1, *scene)
+
+    end_time = 0.0
+    frame_duration = 0.0
+    for frame_index, timestamp, frame in iter_frames(video_path):
+        scene = detector.push(timestamp, frame)
+        if scene is not None:
+            close_scene(scene)
+        on_frame(timestamp, frame)
+
+        if frame_index:
+            frame_duration = timestamp / frame_index
+        end_time = timestamp + frame_duration
+
+    scene = detector.flush(end_time)
+    if scene is not None:
+        close_scene(scene)
+
+    logger.info(f"Detected {len(scene_times)} scenes")
+
+    if intensity_engine == 'motion':
+        intensity_scores = collector.score_scenes(video_path, scene_times, top_k=top_k)
+    else:
+        intensity_scores = scorer.results(scene_times, top_k=top_k)
+    return scene_times, intensity_scores
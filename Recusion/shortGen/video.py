@@ -1,24 +1,38 @@
 # app.py - Flask API for Video Highlight Generation
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Request, Response, request, jsonify, send_file
 from flask_cors import CORS
 import os
 import uuid
-import threading
 import time
 import shutil
 import logging
+import json
+import functools
+import mimetypes
+import numpy as np
+from urllib.parse import quote
 from werkzeug.utils import secure_filename
 
 # Import video processing functions
-import moviepy.editor as mp
-import whisper
-import subprocess
-import pandas as pd
+from utils.media import probe_video, load_audio, is_faststart, make_faststart
+from utils.transcription import transcribe_audio, warm_transcription, TRANSCRIBE_WORKERS, WHISPER_MODEL
 
 # Import new modules
-from utils.scene_intensity import analyze_scene_intensity
-from utils.sentiment_analysis import analyze_sentiment
+from utils.video_analysis import analyze_video
+from utils.proxy import ensure_proxy, PROXY_HEIGHT, PROXY_FPS
+from utils.clip_cutter import CutPlanner
+from utils.render_scheduler import EncodeSlots, render_highlight, render_lock
+from utils.render_profiles import RENDER_PROFILES, DEFAULT_RENDER_PROFILE, highlight_filename
+from utils.sentiment_analysis import analyze_segment_sentiment
+from utils.scoring import ScoringEngine, DEFAULT_SIGNAL_WEIGHTS
+from utils.selection import plan_highlights
+from utils.pipeline import Pipeline, Stage
+from utils.metrics import MetricsStore, StageMeter
+from utils.result_cache import ResultCache, save_and_hash
+from utils.ingest import IngestWriter, UploadSessions, UnsupportedMediaError
 from utils.youtube_uploader import authenticate_youtube, upload_video
+from utils.job_queue import JobStore, WorkerPool, PENDING_STATUSES
+from utils.model_registry import registry
 
 from utils.youtube_uploader import get_authenticated_service, get_channel_analytics, get_video_analytics, convert_analytics_to_dataframe, analyze_video_performance, get_all_video_ids
 
@@ -28,8 +42,31 @@ from utils.youtube_uploader import get_authenticated_service, get_channel_analyt
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class IngestRequest(Request):
+    """
+    Request that streams uploaded videos straight into the uploads folder.
+
+    Each video part is written by an IngestWriter, which hashes it and checks
+    its container and streams while the bytes arrive, so no second pass over
+    the file is needed and bad uploads are refused early. Files the view did
+    not move into place are removed when the request closes.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if filename and allowed_file(filename):
+            writer = IngestWriter(os.path.join(UPLOAD_FOLDER, f"incoming_{uuid.uuid4()}"))
+            self.__dict__.setdefault('ingest_writers', []).append(writer)
+            return writer
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+    def close(self):
+        super().close()
+        for writer in self.__dict__.get('ingest_writers', []):
+            writer.abort()
+
 # Initialize Flask app
 app = Flask(__name__)
+app.request_class = IngestRequest
 CORS(app)  # Enable CORS for all routes
 
 # Configuration
@@ -38,6 +75,52 @@ RESULTS_FOLDER = 'results'
 ALLOWED_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv', 'webm'}
 MAX_CONTENT_LENGTH = 500 * 1024 * 1024  # 500MB max upload size
 
+# Job queue configuration
+JOBS_DB_PATH = os.environ.get('JOBS_DB_PATH', 'jobs.db')
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 2))  # Concurrent pipelines per box
+MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', 20))  # Waiting jobs before uploads get 429
+
+# Models loaded by every worker before it takes its first job (empty = load lazily).
+# Whisper is loaded by the transcription pool's children instead when TRANSCRIBE_WORKERS > 1.
+WARM_MODELS = [name for name in os.environ.get('WARM_MODELS', 'whisper-base,resnet50,vader').split(',') if name]
+
+# Scene intensity sampling
+INTENSITY_FRAMES_PER_SCENE = int(os.environ.get('INTENSITY_FRAMES_PER_SCENE', 1))
+INTENSITY_BATCH_SIZE = int(os.environ.get('INTENSITY_BATCH_SIZE', 32))
+
+# Intensity engines selectable per job: 'resnet' (ResNet-50 feature norm) or 'motion' (CPU-only NumPy signals)
+INTENSITY_ENGINES = ('resnet', 'motion')
+DEFAULT_INTENSITY_ENGINE = os.environ.get('DEFAULT_INTENSITY_ENGINE', 'resnet')
+
+# Weight of each signal in the highlight score (scene intensity, sentiment magnitude)
+SIGNAL_WEIGHTS = dict(DEFAULT_SIGNAL_WEIGHTS)
+
+# Highlight selection: seconds kept between highlights, and the default cap on their summed length (0 = none)
+HIGHLIGHT_MIN_GAP = float(os.environ.get('HIGHLIGHT_MIN_GAP', 1.0))
+MAX_HIGHLIGHT_RUNTIME = float(os.environ.get('MAX_HIGHLIGHT_RUNTIME', 0))
+
+# Share of job progress credited when each analysis stage finishes (highlights are rendered on request)
+STAGE_PROGRESS = {
+    'probe': 10,
+    'audio': 10,
+    'transcribe': 25,
+    'sentiment': 5,
+    'proxy': 5,
+    'video_analysis': 25,
+    'select': 5
+}
+
+# Threads running independent pipeline stages of one job
+PIPELINE_THREADS = int(os.environ.get('PIPELINE_THREADS', 4))
+
+# Highlight downloads: browser cache lifetime, and whether MP4s without faststart are fixed before serving
+DOWNLOAD_MAX_AGE = int(os.environ.get('DOWNLOAD_MAX_AGE', 3600))
+DOWNLOAD_FASTSTART = os.environ.get('DOWNLOAD_FASTSTART', '1') == '1'
+# Hand file transfers to the front-end server: X-Sendfile (Apache, lighttpd) or the
+# prefix of an nginx internal location that maps to RESULTS_FOLDER (X-Accel-Redirect)
+USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '0') == '1'
+X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX', '').rstrip('/')
+
 # Create necessary directories
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(RESULTS_FOLDER, exist_ok=True)
@@ -45,9 +128,22 @@ os.makedirs('temp', exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+app.config['USE_X_SENDFILE'] = USE_X_SENDFILE
+
+# Durable job store shared by the API and the worker processes
+job_store = JobStore(JOBS_DB_PATH)
+
+# Resumable chunked uploads (POST /api/uploads, then PATCH chunks)
+upload_sessions = UploadSessions(os.path.join(UPLOAD_FOLDER, 'sessions'))
+
+# Per-stage timing and resource histograms, shared by all workers (served at /api/metrics)
+metrics_store = MetricsStore(JOBS_DB_PATH)
 
-# Dictionary to store job status
-jobs = {}
+# Content-addressed cache of transcripts, scene lists and scene scores
+result_cache = ResultCache()
+
+# Machine-wide cap on concurrent highlight encodes (MAX_CONCURRENT_ENCODES), shared by all jobs
+encode_slots = EncodeSlots()
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -56,346 +152,458 @@ def merge_scores(sentiment_scores, intensity_scores, weight_sentiment=0.4, weigh
     """
     Merge sentiment analysis scores and visual intensity scores to find the best highlights.
     
+    Sentiment windows and scenes are joined by time overlap: each scene takes
+    the overlap-weighted mean of the sentiment windows it overlaps. Sentiment
+    windows that overlap no scored scene remain candidates on their own.
+    
     Parameters:
     - sentiment_scores: List of dicts with {'start_time', 'end_time', 'score'} from sentiment analysis
-    - intensity_scores: List of dicts with {'start_time', 'end_time', 'score'} from scene intensity
+    - intensity_scores: List of dicts with {'start_time', 'end_time', 'intensity'} (or 'score') from scene intensity
     - weight_sentiment: Weight to give sentiment scores in the final scoring (0-1)
     - weight_intensity: Weight to give intensity scores in the final scoring (0-1)
-    - num_highlights: Number of highlights to return
+    - num_highlights: Number of highlights to return (None = all)
     
     Returns:
     - List of dicts with {'start_time', 'end_time', 'score'} representing the top highlights
     """
-    # Normalize scores within each category
-    def normalize_scores(scores_list):
-        if not scores_list:
-            return []
-            
-        max_score = max(item['score'] for item in scores_list)
-        min_score = min(item['score'] for item in scores_list)
-        score_range = max_score - min_score if max_score > min_score else 1
-        
-        normalized = []
-        for item in scores_list:
-            normalized_item = item.copy()
-            normalized_item['score'] = (item['score'] - min_score) / score_range
-            normalized.append(normalized_item)
-        return normalized
-    
-    norm_sentiment = normalize_scores(sentiment_scores)
-    norm_intensity = normalize_scores(intensity_scores)
-    
-    # Create segments dictionary to track all potential highlight segments
-    all_segments = {}
-    
-    # Add sentiment segments
-    for item in norm_sentiment:
-        key = (item['start_time'], item['end_time'])
-        if key not in all_segments:
-            all_segments[key] = {
-                'start_time': item['start_time'],
-                'end_time': item['end_time'],
-                'sentiment_score': item['score'],
-                'intensity_score': 0
-            }
-        else:
-            all_segments[key]['sentiment_score'] = item['score']
-    
-    # Add intensity segments
-    for item in norm_intensity:
-        key = (item['start_time'], item['end_time'])
-        if key not in all_segments:
-            all_segments[key] = {
-                'start_time': item['start_time'],
-                'end_time': item['end_time'],
-                'sentiment_score': 0,
-                'intensity_score': item['score']
-            }
-        else:
-            all_segments[key]['intensity_score'] = item['score']
-    
-    # Calculate combined scores
-    merged_results = []
-    for segment in all_segments.values():
-        combined_score = (segment['sentiment_score'] * weight_sentiment + 
-                         segment['intensity_score'] * weight_intensity)
-        
-        merged_results.append({
-            'start_time': segment['start_time'],
-            'end_time': segment['end_time'],
-            'score': combined_score
-        })
+    table = score_segments(sentiment_scores, intensity_scores, {
+        'intensity': weight_intensity,
+        'sentiment': weight_sentiment
+    })
+    order = np.argsort(-table['score'], kind='stable')[:num_highlights]
+    return [
+        {
+            'start_time': float(table['start_time'][i]),
+            'end_time': float(table['end_time'][i]),
+            'score': float(table['score'][i])
+        }
+        for i in order
+    ]
+
+def score_segments(sentiment_scores, intensity_scores, weights=None):
+    """
+    Build the columnar score table of every scene and sentiment window.
+    
+    Parameters:
+    - sentiment_scores: List of dicts with {'start_time', 'end_time', 'score'}
+    - intensity_scores: List of dicts with {'start_time', 'end_time', 'intensity'} (or 'score')
+    - weights: dict of signal name -> weight (default SIGNAL_WEIGHTS)
     
-    # Sort by score and return top highlights
-    merged_results.sort(key=lambda x: x['score'], reverse=True)
-    return merged_results[:num_highlights]
+    Returns:
+    - dict of arrays, see ScoringEngine.score()
+    """
+    weights = weights or SIGNAL_WEIGHTS
+    engine = ScoringEngine()
+    # Scenes come first so they are the candidates wherever they exist
+    engine.add_signal(
+        'intensity',
+        [item['start_time'] for item in intensity_scores],
+        [item['end_time'] for item in intensity_scores],
+        [item.get('intensity', item.get('score', 0)) for item in intensity_scores],
+        weight=weights.get('intensity', 0)
+    )
+    # Emotional intensity is the magnitude of the compound score, positive or negative
+    engine.add_signal(
+        'sentiment',
+        [item['start_time'] for item in sentiment_scores],
+        [item['end_time'] for item in sentiment_scores],
+        [abs(item['score']) for item in sentiment_scores],
+        weight=weights.get('sentiment', 0)
+    )
+    return engine.score()
 
-# Video processing function
-def process_video(video_path, job_id, num_highlights=3, highlight_duration=(20, 30)):
-    """Process a video file to generate highlights"""
+def select_highlights(sentiment_scores, scene_times, intensity_scores, total_duration,
+                      num_highlights=3, highlight_duration=(20, 30), min_gap=HIGHLIGHT_MIN_GAP,
+                      max_total_duration=None):
+    """
+    Pick the best non-overlapping set of highlight time ranges.
+    
+    Candidates are every scored scene and sentiment window, plus every
+    detected scene and an evenly spaced grid of windows at zero score, so the
+    plan is still filled when analysis found little. The set is chosen by
+    weighted interval scheduling under the duration limits, min_gap and
+    max_total_duration, with clip edges snapped to scene cuts where possible.
+    
+    Returns:
+    - List of (start_time, end_time) tuples, best first
+    """
+    starts, ends, scores = [], [], []
+    
+    # Score every scene and sentiment window
+    if sentiment_scores or intensity_scores:
+        table = score_segments(sentiment_scores, intensity_scores)
+        starts.append(table['start_time'])
+        ends.append(table['end_time'])
+        scores.append(table['score'])
+        logger.info(f"Scored {len(table['score'])} candidate segments.")
+    
+    # Unscored scenes and evenly spaced windows as zero-score fallbacks
+    if scene_times:
+        scenes = np.asarray(scene_times, dtype=np.float64).reshape(-1, 2)
+        starts.append(scenes[:, 0])
+        ends.append(scenes[:, 1])
+        scores.append(np.zeros(len(scenes)))
+    grid = np.arange(0.0, max(total_duration - highlight_duration[0], 0.0) + 1e-9, highlight_duration[1] / 2)
+    starts.append(grid)
+    ends.append(np.minimum(grid + highlight_duration[1], total_duration))
+    scores.append(np.zeros(len(grid)))
+    
+    selected = plan_highlights(
+        np.concatenate(starts),
+        np.concatenate(ends),
+        np.concatenate(scores),
+        num_highlights,
+        highlight_duration[0],
+        highlight_duration[1],
+        total_duration,
+        boundaries=[t for scene in scene_times for t in scene],
+        min_gap=min_gap,
+        max_total_duration=max_total_duration
+    )
+    selected.sort(key=lambda item: item['score'], reverse=True)
+    logger.info(f"Selected {len(selected)} non-overlapping highlights.")
+    return [(item['start_time'], item['end_time']) for item in selected]
+
+def highlight_metadata(highlights, render_profile):
+    """
+    Metadata of each selected highlight: its time range, the file in the
+    job's render profile and its preview. Neither file exists until it is
+    first downloaded or uploaded.
+    """
+    return [
+        {
+            "filename": highlight_filename(render_profile, i),
+            "preview_filename": highlight_filename('preview', i),
+            "render_profile": render_profile,
+            "start_time": start_time,
+            "end_time": end_time,
+            "duration": end_time - start_time
+        }
+        for i, (start_time, end_time) in enumerate(highlights)
+    ]
+
+@functools.lru_cache(maxsize=16)
+def cut_planner(video_path):
+    """CutPlanner per source video, so renders of one job probe its keyframes once."""
+    return CutPlanner(video_path)
+
+def ensure_highlight(job_id, video_path, highlight, preview=False):
+    """
+    Path of a highlight's file (or its preview), rendering it from the source
+    video on first request. Concurrent requests for the same file share one render.
+
+    A stream-copied highlight starts on the keyframe its cut snapped to; its
+    metadata (here and in the job store) is updated to that actual start.
+    """
+    filename = highlight['preview_filename'] if preview else highlight['filename']
+    path = os.path.join(RESULTS_FOLDER, job_id, filename)
+    if os.path.exists(path):
+        return path
+
+    with render_lock(path):
+        if not os.path.exists(path):
+            status = 'failed'
+            meter = StageMeter('render')
+            try:
+                with meter:
+                    cut = render_highlight(
+                        cut_planner(video_path),
+                        highlight['start_time'],
+                        highlight['end_time'],
+                        path,
+                        profile='preview' if preview else highlight.get('render_profile', DEFAULT_RENDER_PROFILE),
+                        slots=encode_slots
+                    )
+                status = 'ok'
+            finally:
+                try:
+                    metrics_store.record(meter.name, status, meter.metrics)
+                except Exception as e:
+                    logger.error(f"Failed to record metrics for stage {meter.name}: {str(e)}")
+            if not preview and cut['start_time'] != highlight['start_time']:
+                highlight.update(start_time=cut['start_time'], duration=cut['end_time'] - cut['start_time'])
+                job_store.update_highlight(job_id, highlight['filename'], start_time=highlight['start_time'],
+                                           duration=highlight['duration'])
+    return path
+
+def send_media(job_id, filename, file_path, as_attachment=True):
+    """
+    Serve a result file for download or in-browser playback.
+
+    send_file answers Range requests with 206, and If-None-Match and
+    If-Modified-Since with 304 (the ETag covers mtime and size, and
+    renders are replaced atomically). Full responses go through the
+    server's wsgi.file_wrapper, which is sendfile() under gunicorn. With
+    X-Accel-Redirect or X-Sendfile the front-end server sends the file,
+    ranges included, and Python never touches the bytes.
+    """
+    if DOWNLOAD_FASTSTART and file_path.lower().endswith(('.mp4', '.mov')) and not is_faststart(file_path):
+        # moov at the end means players must fetch the whole file before starting
+        with render_lock(file_path):
+            if not is_faststart(file_path):
+                logger.info(f"Moving the moov box of {filename} to the front")
+                make_faststart(file_path)
+    
+    if X_ACCEL_REDIRECT_PREFIX:
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline', filename=filename)
+        response.headers['X-Accel-Redirect'] = quote(f"{X_ACCEL_REDIRECT_PREFIX}/{job_id}/{filename}")
+        response.cache_control.max_age = DOWNLOAD_MAX_AGE
+        return response
+    
+    return send_file(file_path, as_attachment=as_attachment, download_name=filename,
+                     conditional=True, etag=True, max_age=DOWNLOAD_MAX_AGE)
+
+def upload_highlights_to_youtube(highlights, job_id, video_path):
+    """
+    Upload highlights to YouTube, returning per highlight the YouTube fields for its metadata.
+    
+    highlights are the job's metadata entries; rendering updates them in place
+    with the actual start of each cut (see ensure_highlight).
+    """
     # Path to your service account JSON key
     API_KEY_FILE = 'Recusion\shortGen\cred.json'
 
-# Authenticate YouTube API once when the app starts
+    # Authenticate YouTube API
     try:
         youtube_client = authenticate_youtube(API_KEY_FILE)
     except Exception as e:
         logger.error(f"Failed to authenticate with YouTube API: {str(e)}")
         youtube_client = None
 
-# another
-    try:
-        job_folder = os.path.join(RESULTS_FOLDER, job_id)
-        os.makedirs(job_folder, exist_ok=True)
-        
-        # Update job status
-        jobs[job_id]['status'] = 'processing'
-        jobs[job_id]['progress'] = 10
-        
-        # Load the video file
-        clip = mp.VideoFileClip(video_path)
-        total_duration = clip.duration
-        logger.info(f"Video loaded. Duration: {total_duration:.2f} seconds")
-        
-        # Update progress
-        jobs[job_id]['progress'] = 20
-        
-        # Check if audio exists
-        has_audio = clip.audio is not None
-        
-        # Extract audio and transcribe if available
-        transcript = None
-        sentiment_scores = []
-        if has_audio:
-            audio_path = os.path.join('temp', f"{job_id}_audio.wav")
-            clip.audio.write_audiofile(audio_path)
-            
-            # Update progress
-            jobs[job_id]['progress'] = 40
-            
-            # Load whisper model and transcribe
+    youtube_info = [{} for _ in highlights]
+    if youtube_client:
+        for i, item in enumerate(highlights):
             try:
-                model = whisper.load_model("base")
-                result = model.transcribe(audio_path)
-                transcript = result['text']
-                logger.info("Transcription completed")
-                
-                # Save transcript
-                with open(os.path.join(job_folder, 'transcript.txt'), 'w') as f:
-                    f.write(transcript)
-
-                if transcript:
-                    sentiment_scores = analyze_sentiment(transcript)
-                    logger.info(f"Sentiment analysis completed. Top sentiment lines: {len(sentiment_scores)}")
+                title = f"Highlight {i+1} - {os.path.basename(video_path)}"
+                description = f"Automatically generated highlight from {os.path.basename(video_path)}"
+        
+                # Default to unlisted for safety
+                privacy_status = 'unlisted'
+        
+                # Custom tags for better searchability
+                tags = ['AI Generated', 'Video Highlights', 'Automatic Editing']
+        
+                video_id, status = upload_video(
+                    youtube_client, 
+                    ensure_highlight(job_id, video_path, item), 
+                    title, 
+                    description,
+                )
+        
+                logger.info(f"Uploaded highlight {i+1} to YouTube. Video ID: {video_id}, Status: {status}")
+        
+                # Add YouTube info to metadata
+                youtube_info[i]["youtube_id"] = video_id
+                youtube_info[i]["youtube_url"] = f"https://www.youtube.com/watch?v={video_id}"
+        
             except Exception as e:
-                logger.error(f"Transcription error: {str(e)}")
+                logger.error(f"Error uploading highlight {i+1} to YouTube: {str(e)}")
+                youtube_info[i]["youtube_error"] = str(e)
+    return youtube_info
 
-            # Remove temporary audio file
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
+def build_pipeline(job_id, job_folder, auto_upload=False):
+    """
+    Stage graph of one job.
+    
+    The audio branch (audio -> transcribe -> sentiment) and the video branch
+    (proxy -> video_analysis) only meet at select, so they run concurrently.
+    Video analysis decodes a low-resolution proxy. The job ends with the
+    selected time ranges; clips are cut from the original on request. Analysis
+    stages are optional: if one fails the job continues with empty results,
+    as selection falls back to scenes or even spacing.
+    
+    Only with auto_upload does an upload stage follow select; it renders every
+    highlight in the worker and uploads it to YouTube.
+    """
+    def probe(video_path, video_info):
+        # Uploads arrive already probed by the ingest step
+        video_info = video_info or probe_video(video_path)
+        logger.info(f"Video loaded. Duration: {video_info['duration']:.2f} seconds")
+        return {
+            'media_info': video_info,
+            'total_duration': video_info['duration'],
+            'has_audio': video_info['has_audio']
+        }
+    
+    def audio(video_path, has_audio, content_hash):
+        # Re-uploads of the same file reuse their transcript and skip decoding
+        transcript_key = f"{content_hash}:transcript" if content_hash else None
+        cached = result_cache.get(transcript_key) if (has_audio and transcript_key) else None
+        if cached is not None:
+            logger.info("Transcript loaded from cache")
+            return {'samples': None, 'cached_transcript': cached}
         
-        # Update progress
-        jobs[job_id]['progress'] = 60
+        # Get 16 kHz mono samples straight from ffmpeg (no WAV round-trip)
+        samples = load_audio(video_path) if has_audio else None
+        return {'samples': samples, 'cached_transcript': None}
+    
+    def transcribe(samples, cached_transcript, content_hash):
+        result = cached_transcript
+        if result is None and samples is not None:
+            result = transcribe_audio(samples, workers=TRANSCRIBE_WORKERS)
+            if content_hash:
+                result_cache.put(f"{content_hash}:transcript", result)
+        if result is None:
+            return {'transcript': None, 'segments': []}
         
-        # Run scene detection
-        scenes_file = os.path.abspath(os.path.join('temp', f"{job_id}_scenes.csv"))
-        scene_output_dir = os.path.abspath(os.path.join('temp', f"{job_id}_scenes"))
-        os.makedirs(scene_output_dir, exist_ok=True)
+        logger.info(f"Transcription completed. Segments: {len(result['segments'])}")
         
-        scenes_df = None
-        intensity_scores = []
+        # Save transcript and timestamped segments
+        with open(os.path.join(job_folder, 'transcript.txt'), 'w') as f:
+            f.write(result['text'])
+        with open(os.path.join(job_folder, 'segments.json'), 'w') as f:
+            json.dump(result['segments'], f, indent=2)
+        return {'transcript': result['text'], 'segments': result['segments']}
+    
+    def sentiment(segments):
+        # Keep every window: scoring handles thousands of candidates
+        sentiment_scores = analyze_segment_sentiment(segments, top_k=None) if segments else []
+        logger.info(f"Sentiment analysis completed. Sentiment windows: {len(sentiment_scores)}")
+        return {'sentiment_scores': sentiment_scores}
+    
+    def scenes_key(content_hash, intensity_engine):
+        # Scene list and scores depend on the file, the engine settings and the proxy format only
+        if not content_hash:
+            return None
+        return (f"{content_hash}:scenes:{intensity_engine}:{INTENSITY_FRAMES_PER_SCENE}:all"
+                f":proxy{PROXY_HEIGHT}p{PROXY_FPS:g}")
+    
+    def proxy(video_path, media_info, content_hash, intensity_engine):
+        key = scenes_key(content_hash, intensity_engine)
+        cached = result_cache.get(key) if key else None
+        if cached is not None:
+            logger.info("Scenes and intensity scores loaded from cache")
+            return {'analysis_path': None, 'cached_scenes': cached}
         
-        try:
-            subprocess.run([
-                'scenedetect',
-                '--input', video_path,
-                '--output', scene_output_dir,
-                'detect-content',
-                '--threshold', '30',
-                'list-scenes',
-                '--output', scenes_file
-            ], check=True)
-            
-            logger.info("Scene detection completed")
-            
-            # Read the CSV file with scene information
-            if os.path.exists(scenes_file):
-                try:
-                    scenes_df = pd.read_csv(scenes_file)
-                    logger.info(f"Detected {len(scenes_df)} scenes")
-                    
-                    # Extract scene times
-                    scene_times = []
-                    if scenes_df is not None and len(scenes_df) > 0:
-                        scene_times = [
-                            (scenes_df.iloc[i]['Start Time (seconds)'], scenes_df.iloc[i]['End Time (seconds)'])
-                            for i in range(len(scenes_df))
-                        ]
-                    
-                    # Analyze intensity and update results
-                    intensity_scores = analyze_scene_intensity(video_path, scene_times)
-                    logger.info(f"Scene intensity analysis completed. Top scenes: {len(intensity_scores)}")
-                except Exception as e:
-                    logger.error(f"Error reading scene CSV: {str(e)}")
-        except Exception as e:
-            logger.error(f"Scene detection error: {str(e)}")
+        # Low-resolution, low-fps copy for analysis; highlights are still cut from the original
+        return {'analysis_path': ensure_proxy(video_path, media_info, job_folder), 'cached_scenes': None}
+    
+    def video_analysis(video_path, analysis_path, cached_scenes, content_hash, intensity_engine):
+        if cached_scenes is not None:
+            scene_times = [tuple(scene) for scene in cached_scenes['scene_times']]
+            intensity_scores = cached_scenes['intensity_scores']
+        else:
+            # Detect scenes and score their intensity in one in-process decoding pass
+            scene_times, intensity_scores = analyze_video(
+                analysis_path or video_path,
+                intensity_engine=intensity_engine,
+                frames_per_scene=INTENSITY_FRAMES_PER_SCENE,
+                batch_size=INTENSITY_BATCH_SIZE,
+                top_k=None
+            )
+            key = scenes_key(content_hash, intensity_engine)
+            if key:
+                result_cache.put(key, {
+                    'scene_times': scene_times,
+                    'intensity_scores': intensity_scores
+                })
+        logger.info(f"Scene intensity analysis ({intensity_engine}) completed. Scored scenes: {len(intensity_scores)}")
+        return {'scene_times': scene_times, 'intensity_scores': intensity_scores}
+    
+    def select(sentiment_scores, scene_times, intensity_scores, total_duration,
+               num_highlights, highlight_duration, min_gap, max_total_duration, render_profile):
+        highlights = select_highlights(
+            sentiment_scores, scene_times, intensity_scores, total_duration,
+            num_highlights, highlight_duration, min_gap, max_total_duration
+        )
+        # The job's metadata list; later stages update these entries, and the job stores them as they end up
+        return {'highlights': highlights, 'metadata': highlight_metadata(highlights, render_profile)}
+    
+    def youtube(metadata, video_path):
+        return {'youtube_info': upload_highlights_to_youtube(metadata, job_id, video_path)}
+    
+    pipeline = Pipeline([
+        Stage('probe', probe, ('video_path', 'video_info'), ('media_info', 'total_duration', 'has_audio')),
+        Stage('audio', audio, ('video_path', 'has_audio', 'content_hash'), ('samples', 'cached_transcript'),
+              fallback={}),
+        Stage('transcribe', transcribe, ('samples', 'cached_transcript', 'content_hash'), ('transcript', 'segments'),
+              fallback={'segments': []}),
+        Stage('sentiment', sentiment, ('segments',), ('sentiment_scores',),
+              fallback={'sentiment_scores': []}),
+        Stage('proxy', proxy, ('video_path', 'media_info', 'content_hash', 'intensity_engine'),
+              ('analysis_path', 'cached_scenes'), fallback={}),
+        Stage('video_analysis', video_analysis,
+              ('video_path', 'analysis_path', 'cached_scenes', 'content_hash', 'intensity_engine'),
+              ('scene_times', 'intensity_scores'), fallback={'scene_times': [], 'intensity_scores': []}),
+        Stage('select', select,
+              ('sentiment_scores', 'scene_times', 'intensity_scores', 'total_duration',
+               'num_highlights', 'highlight_duration', 'min_gap', 'max_total_duration', 'render_profile'),
+              ('highlights', 'metadata'))
+    ], max_workers=PIPELINE_THREADS, meter=StageMeter)
+    
+    if auto_upload:
+        pipeline.add(Stage('upload', youtube, ('metadata', 'video_path'), ('youtube_info',),
+                           fallback={'youtube_info': []}))
+    return pipeline
+
+# Video processing function
+def process_video(video_path, job_id, num_highlights=3, highlight_duration=(20, 30), intensity_engine=DEFAULT_INTENSITY_ENGINE,
+                  content_hash=None, video_info=None, min_gap=HIGHLIGHT_MIN_GAP, max_total_duration=None,
+                  render_profile=DEFAULT_RENDER_PROFILE, auto_upload=False):
+    """Process a video file to generate highlights"""
+    try:
+        job_folder = os.path.join(RESULTS_FOLDER, job_id)
+        os.makedirs(job_folder, exist_ok=True)
         
-        # Update progress
-        jobs[job_id]['progress'] = 70
+        # Update job status
+        job_store.update_job(job_id, status='processing', progress=10)
         
-        # Determine highlights
-        highlights = []
+        progress = {'value': 10}
+        stages = {}
         
-        # Merge sentiment and intensity scores to get top highlights
-        if transcript and intensity_scores:
-            merged_scores = merge_scores(sentiment_scores, intensity_scores, num_highlights=num_highlights)
-            logger.info(f"Merged scores generated. Top {len(merged_scores)} highlights selected.")
-            
-            # Use merged_scores for highlight generation
-            for score in merged_scores:
-                start_time = score['start_time']
-                end_time = score['end_time']
-                
-                # Ensure minimum and maximum duration
-                current_duration = end_time - start_time
-                if current_duration < highlight_duration[0]:
-                    # Extend if too short
-                    extension = (highlight_duration[0] - current_duration) / 2
-                    start_time = max(0, start_time - extension)
-                    end_time = min(total_duration, end_time + extension)
-                elif current_duration > highlight_duration[1]:
-                    # Trim if too long
-                    middle = (start_time + end_time) / 2
-                    half_duration = highlight_duration[1] / 2
-                    start_time = middle - half_duration
-                    end_time = middle + half_duration
-                
-                # Ensure we don't exceed clip duration
-                if end_time > total_duration:
-                    end_time = total_duration
-                
-                # Add highlight based on merged scores
-                if start_time < end_time:
-                    highlights.append((start_time, end_time))
-        
-        # If we don't have enough highlights from merged scores, fall back to scene detection
-        if len(highlights) < num_highlights and scenes_df is not None and len(scenes_df) > 0:
-            scenes_needed = num_highlights - len(highlights)
-            for i in range(min(scenes_needed, len(scenes_df))):
-                start_time = scenes_df.iloc[i]['Start Time (seconds)']
-                max_duration = min(highlight_duration[1], scenes_df.iloc[i]['Length (seconds)'])
-                end_time = start_time + max_duration
-                
-                # Ensure we don't exceed clip duration
-                if end_time > total_duration:
-                    end_time = total_duration
-                
-                # Ensure minimum duration if possible
-                if end_time - start_time < highlight_duration[0] and i < len(scenes_df) - 1:
-                    end_time = start_time + highlight_duration[0]
-                    if end_time > total_duration:
-                        end_time = total_duration
-                
-                highlights.append((start_time, end_time))
-        
-        # If we still need more highlights or no scenes were detected
-        remaining = num_highlights - len(highlights)
-        if remaining > 0:
-            segment_length = min(highlight_duration[1], total_duration / (remaining + 1))
-            for i in range(remaining):
-                start_time = (i + 1) * segment_length
-                end_time = start_time + segment_length
-                if end_time > total_duration:
-                    end_time = total_duration
-                if start_time < end_time:  # Make sure we have a valid segment
-                    highlights.append((start_time, end_time))
-        
-        # Update progress
-        jobs[job_id]['progress'] = 80
-        
-        # Create highlight videos
-        highlight_paths = []
-        metadata = []
-        
-        for i, (start, end) in enumerate(highlights):
-            highlight_name = f"highlight_{i+1}.mp4"
-            output_path = os.path.join(job_folder, highlight_name)
-            
-            logger.info(f"Creating highlight {i+1} from {start:.2f}s to {end:.2f}s")
-            
-            # Create subclip and write to file
-            subclip = clip.subclip(start, end)
-            subclip.write_videofile(
-                output_path, 
-                codec='libx264', 
-                audio_codec='aac' if has_audio else None,
-                threads=2,
-                verbose=False,
-                logger=None
-            )
-            
-            highlight_paths.append(output_path)
-            metadata.append({
-                "filename": highlight_name,
-                "start_time": start,
-                "end_time": end,
-                "duration": end - start
-            })
+        def on_stage_end(stage_name, entry):
+            metrics = entry.get('metrics', {})
+            stages[stage_name] = dict(metrics, status=entry['status'], error=entry['error'])
+            try:
+                metrics_store.record(stage_name, entry['status'], metrics)
+            except Exception as e:
+                logger.error(f"Failed to record metrics for stage {stage_name}: {str(e)}")
             
-            # Increment progress as each highlight is completed
-            jobs[job_id]['progress'] = 80 + ((i + 1) * 20 // len(highlights))
+            fields = {'stages': dict(stages)}
+            if stage_name in STAGE_PROGRESS:
+                progress['value'] += STAGE_PROGRESS[stage_name]
+                fields['progress'] = progress['value']
+            job_store.update_job(job_id, **fields)
+        
+        pipeline = build_pipeline(job_id, job_folder, auto_upload)
+        values, report = pipeline.run({
+            'video_path': video_path,
+            'video_info': video_info,
+            'content_hash': content_hash,
+            'intensity_engine': intensity_engine,
+            'num_highlights': num_highlights,
+            'highlight_duration': highlight_duration,
+            'min_gap': min_gap,
+            'max_total_duration': max_total_duration,
+            'render_profile': render_profile
+        }, on_stage_end=on_stage_end)
+        
+        # Highlight files are rendered on first download or upload (or by the upload stage, which
+        # has already corrected the start of the cuts it rendered in these entries)
+        metadata = values['metadata']
+        highlight_paths = [os.path.join(job_folder, item['filename']) for item in metadata]
+        for item, youtube_info in zip(metadata, values.get('youtube_info', [])):
+            item.update(youtube_info)
         
         # Save metadata
         with open(os.path.join(job_folder, 'metadata.json'), 'w') as f:
-            import json
             json.dump({
                 "original_video": os.path.basename(video_path),
-                "total_duration": total_duration,
-                "has_audio": has_audio,
+                "total_duration": values['total_duration'],
+                "has_audio": values['has_audio'],
                 "highlights": metadata,
-                "transcript": transcript
+                "transcript": values['transcript']
             }, f, indent=2)
         
-        # Clean up
-        clip.close()
-
-        # Upload highlights to YouTube
-        if youtube_client:
-            for i, highlight_path in enumerate(highlight_paths):
-                try:
-                    title = f"Highlight {i+1} - {os.path.basename(video_path)}"
-                    description = f"Automatically generated highlight from {os.path.basename(video_path)}"
-            
-            # Default to unlisted for safety
-                    privacy_status = 'unlisted'
-            
-            # Custom tags for better searchability
-                    tags = ['AI Generated', 'Video Highlights', 'Automatic Editing']
-            
-                    video_id, status = upload_video(
-                    youtube_client, 
-                    highlight_path, 
-                    title, 
-                    description,
-                    
-                 )
-            
-                    logger.info(f"Uploaded highlight {i+1} to YouTube. Video ID: {video_id}, Status: {status}")
-            
-            # Add YouTube info to metadata
-                    metadata[i]["youtube_id"] = video_id
-                    metadata[i]["youtube_url"] = f"https://www.youtube.com/watch?v={video_id}"
-            
-                except Exception as e:
-                    logger.error(f"Error uploading highlight {i+1} to YouTube: {str(e)}")
-                    metadata[i]["youtube_error"] = str(e)
-
-        
         # Update job status to complete
-        jobs[job_id]['status'] = 'complete'
-        jobs[job_id]['progress'] = 100
-        jobs[job_id]['result_files'] = highlight_paths
-        jobs[job_id]['metadata'] = metadata
+        job_store.update_job(
+            job_id,
+            status='complete',
+            progress=100,
+            result_files=highlight_paths,
+            metadata=metadata
+        )
         
         logger.info(f"Job {job_id} completed successfully")
         return True
@@ -403,10 +611,36 @@ def process_video(video_path, job_id, num_highlights=3, highlight_duration=(20,
     except Exception as e:
         logger.error(f"Error processing video: {str(e)}")
         # Update job status to failed
-        jobs[job_id]['status'] = 'failed'
-        jobs[job_id]['error'] = str(e)
+        job_store.update_job(job_id, status='failed', error=str(e))
         return False
 
+def warm_models():
+    """Queue worker initializer: load the analysis models once per worker."""
+    if WHISPER_MODEL in WARM_MODELS:
+        # One copy per process that transcribes: this worker, or each child of its pool
+        warm_transcription(TRANSCRIBE_WORKERS)
+    registry.warm([name for name in WARM_MODELS if name != WHISPER_MODEL])
+
+def model_stats():
+    """Queue worker stats provider: model load times and hit counts."""
+    return registry.stats()
+
+def run_job(job):
+    """Queue worker entry point: run the pipeline for a claimed job."""
+    process_video(
+        job['file_path'],
+        job['id'],
+        job['num_highlights'],
+        tuple(job['highlight_duration']),
+        job.get('intensity_engine', DEFAULT_INTENSITY_ENGINE),
+        job.get('content_hash'),
+        job.get('probe'),
+        min_gap=job.get('min_gap', HIGHLIGHT_MIN_GAP),
+        max_total_duration=job.get('max_total_duration'),
+        render_profile=job.get('render_profile', DEFAULT_RENDER_PROFILE),
+        auto_upload=job.get('auto_upload', False)
+    )
+
 # API Routes
 
 @app.route('/api/uploadToYoutube', methods=['POST'])
@@ -436,19 +670,16 @@ def upload_to_youtube():
             
         job_id = data['video_id']
 
-        # Print for debugging
-        print("Received job_id:", job_id)
-        print("Received job_id:", jobs)
+        logger.debug(f"Received job_id: {job_id}")
 
         
         # Check if job exists
         if not isinstance(job_id, str):
             return jsonify({'error': 'job_id must be a string'}), 400
 
-        if job_id not in jobs:
+        job = job_store.get_job(job_id)
+        if job is None:
             return jsonify({'error': 'Job not found'}), 404
-            
-        job = jobs[job_id]
         
         # Check if job is complete
         if job.get('status') != 'complete':
@@ -461,12 +692,14 @@ def upload_to_youtube():
         if not job.get('metadata') or highlight_index >= len(job.get('metadata', [])):
             return jsonify({'error': 'Invalid highlight index'}), 400
             
-        highlight_metadata = job['metadata'][highlight_index]
-        highlight_path = os.path.join(RESULTS_FOLDER, job_id, highlight_metadata['filename'])
+        highlight = job['metadata'][highlight_index]
         
-        # Check if file exists
-        if not os.path.exists(highlight_path):
-            return jsonify({'error': 'Highlight file not found'}), 404
+        # Render the highlight in the job's profile if this is its first use
+        try:
+            highlight_path = ensure_highlight(job_id, job['file_path'], highlight)
+        except Exception as e:
+            logger.error(f"Failed to render highlight {highlight_index + 1} of job {job_id}: {str(e)}")
+            return jsonify({'error': f'Highlight render failed: {str(e)}'}), 500
         
         # Path to YouTube credentials
         API_KEY_FILE = 'cred.json'
@@ -505,8 +738,10 @@ def upload_to_youtube():
             )
             
             # Save YouTube info in metadata
-            highlight_metadata["youtube_id"] = video_id
-            highlight_metadata["youtube_url"] = f"https://www.youtube.com/watch?v={video_id}"
+            highlight["youtube_id"] = video_id
+            highlight["youtube_url"] = f"https://www.youtube.com/watch?v={video_id}"
+            job_store.update_highlight(job_id, highlight['filename'], youtube_id=video_id,
+                                       youtube_url=highlight["youtube_url"])
             
             return jsonify({
                 'success': True,
@@ -523,64 +758,250 @@ def upload_to_youtube():
         logger.error(f"Error in upload_to_youtube endpoint: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def check_admission():
+    """Admission control: a 429 response while the queue is full, else None."""
+    queued = job_store.count_jobs(('queued',))
+    if queued >= MAX_QUEUED_JOBS:
+        response = jsonify({
+            'error': 'Processing queue is full, please retry later',
+            'queued_jobs': queued
+        })
+        response.headers['Retry-After'] = '60'
+        return response, 429
+    return None
+
+def parse_job_params(values):
+    """
+    Read the processing parameters of an upload.
+
+    Parameters:
+    - values: Form fields or JSON body (any mapping with .get)
+
+    Returns:
+    - dict of job parameters; raises ValueError if one is invalid
+    """
+    intensity_engine = values.get('intensity_engine', DEFAULT_INTENSITY_ENGINE)
+    if intensity_engine not in INTENSITY_ENGINES:
+        raise ValueError(f'Unknown intensity_engine, expected one of {list(INTENSITY_ENGINES)}')
+
+    min_duration = int(values.get('min_duration', 20))
+    max_duration = int(values.get('max_duration', 30))
+    if not 0 < min_duration <= max_duration:
+        raise ValueError('Expected 0 < min_duration <= max_duration')
+
+    # Cap on the summed length of all highlights (0 = none)
+    max_total_duration = float(values.get('max_total_duration', MAX_HIGHLIGHT_RUNTIME)) or None
+    if max_total_duration is not None and max_total_duration < 0:
+        raise ValueError('Expected max_total_duration > 0, or 0 for no cap')
+
+    # Negative gaps would let highlights overlap
+    min_gap = float(values.get('min_gap', HIGHLIGHT_MIN_GAP))
+    if min_gap < 0:
+        raise ValueError('Expected min_gap >= 0')
+
+    render_profile = values.get('render_profile', DEFAULT_RENDER_PROFILE)
+    if render_profile not in RENDER_PROFILES:
+        raise ValueError(f'Unknown render_profile, expected one of {list(RENDER_PROFILES)}')
+
+    return {
+        'num_highlights': int(values.get('num_highlights', 3)),
+        'highlight_duration': (min_duration, max_duration),
+        'min_gap': min_gap,
+        'max_total_duration': max_total_duration,
+        'priority': int(values.get('priority', 0)),
+        'intensity_engine': intensity_engine,
+        'render_profile': render_profile,
+        # Render and upload every highlight to YouTube as part of the job (off: only on request)
+        'auto_upload': str(values.get('auto_upload', '0')).lower() in ('1', 'true', 'yes', 'on')
+    }
+
+def queue_job(job_id, filename, file_path, content_hash, params, probe=None):
+    """Queue a saved upload; a worker process picks it up when a slot frees."""
+    job_store.create_job(job_id, {
+        'filename': filename,
+        'file_path': file_path,
+        'progress': 0,
+        'created_at': time.time(),
+        'num_highlights': params['num_highlights'],
+        'highlight_duration': params['highlight_duration'],
+        'min_gap': params['min_gap'],
+        'max_total_duration': params['max_total_duration'],
+        'intensity_engine': params['intensity_engine'],
+        'render_profile': params['render_profile'],
+        'auto_upload': params['auto_upload'],
+        'content_hash': content_hash,
+        'probe': probe
+    }, priority=params['priority'])
+
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'queue_position': job_store.queue_position(job_id),
+        'message': 'Video upload successful. Processing queued.'
+    }), 202
+
 @app.route('/api/upload', methods=['POST'])
 def upload_videoo():
+    # Refuse new work before the body is read
+    rejected = check_admission()
+    if rejected:
+        return rejected
+
+    # Parsing the form streams the video to disk, hashing and probing it on the way
+    try:
+        files = request.files
+    except UnsupportedMediaError as e:
+        return jsonify({'error': str(e)}), 415
+
     # Check if the post request has the file part
-    if 'video' not in request.files:
+    if 'video' not in files:
         return jsonify({'error': 'No video file provided'}), 400
     
-    file = request.files['video']
+    file = files['video']
     
     # If the user does not select a file
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
     if file and allowed_file(file.filename):
+        try:
+            params = parse_job_params(request.form)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         # Create a new job ID
         job_id = str(uuid.uuid4())
         
-        # Secure the filename and save the file
+        # Secure the filename and move the file into place
         filename = secure_filename(file.filename)
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_{filename}")
-        file.save(file_path)
-        
-        # Get processing parameters
-        num_highlights = int(request.form.get('num_highlights', 3))
-        min_duration = int(request.form.get('min_duration', 20))
-        max_duration = int(request.form.get('max_duration', 30))
-        
-        # Initialize job status
-        jobs[job_id] = {
-            'id': job_id,
-            'filename': filename,
-            'file_path': file_path,
-            'status': 'queued',
-            'progress': 0,
-            'created_at': time.time(),
-            'num_highlights': num_highlights,
-            'highlight_duration': (min_duration, max_duration)
-        }
         
-        # Start processing in a background thread
-        threading.Thread(
-            target=process_video,
-            args=(file_path, job_id, num_highlights, (min_duration, max_duration))
-        ).start()
+        probe = None
+        if isinstance(file.stream, IngestWriter):
+            try:
+                probe = file.stream.finish()
+            except UnsupportedMediaError as e:
+                return jsonify({'error': str(e)}), 415
+            os.replace(file.stream.path, file_path)
+            content_hash = file.stream.hexdigest()
+        else:
+            content_hash = save_and_hash(file.stream, file_path)
         
-        return jsonify({
-            'job_id': job_id,
-            'status': 'queued',
-            'message': 'Video upload successful. Processing started.'
-        }), 202
+        return queue_job(job_id, filename, file_path, content_hash, params, probe)
     
     return jsonify({'error': 'File type not allowed'}), 400
 
+@app.route('/api/uploads', methods=['POST'])
+def create_upload_session():
+    """
+    Start a resumable upload.
+    
+    Expected JSON payload:
+    {
+        "filename": "match.mp4",
+        "size": 123456789  # (optional) Total size in bytes
+    }
+    
+    The video is then sent in PATCH /api/uploads/<upload_id> requests, each
+    with an Upload-Offset header, and queued with POST .../complete.
+    """
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename', ''))
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    
+    size = data.get('size')
+    if size is not None and (not isinstance(size, int) or size <= 0):
+        return jsonify({'error': 'size must be a positive integer'}), 400
+    
+    session = upload_sessions.create(filename, size)
+    return jsonify({
+        'upload_id': session['upload_id'],
+        'offset': 0,
+        'url': f"/api/uploads/{session['upload_id']}"
+    }), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload_session(upload_id):
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    response = jsonify({'upload_id': upload_id, 'offset': session['offset'], 'size': session['size']})
+    response.headers['Upload-Offset'] = str(session['offset'])
+    return response, 200
+
+@app.route('/api/uploads/<upload_id>', methods=['PATCH'])
+def append_upload_chunk(upload_id):
+    with upload_sessions.lock(upload_id):
+        session = upload_sessions.get(upload_id)
+        if session is None:
+            return jsonify({'error': 'Upload not found'}), 404
+        
+        # The client must resume exactly where the server stopped
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return jsonify({'error': 'Missing or invalid Upload-Offset header'}), 400
+        if offset != session['offset']:
+            response = jsonify({'error': 'Upload-Offset does not match', 'offset': session['offset']})
+            response.headers['Upload-Offset'] = str(session['offset'])
+            return response, 409
+        
+        try:
+            session = upload_sessions.append(session, request.stream)
+        except UnsupportedMediaError as e:
+            return jsonify({'error': str(e)}), 415
+        
+        if session['size'] and session['offset'] > session['size']:
+            upload_sessions.discard(upload_id)
+            return jsonify({'error': 'Upload exceeds its declared size'}), 413
+    
+    response = jsonify({'upload_id': upload_id, 'offset': session['offset']})
+    response.headers['Upload-Offset'] = str(session['offset'])
+    return response, 200
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """Finish a resumable upload and queue it with the same parameters as /api/upload."""
+    rejected = check_admission()
+    if rejected:
+        return rejected
+    
+    try:
+        params = parse_job_params(request.get_json(silent=True) or request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with upload_sessions.lock(upload_id):
+        session = upload_sessions.get(upload_id)
+        if session is None:
+            return jsonify({'error': 'Upload not found'}), 404
+        if session['size'] and session['offset'] != session['size']:
+            return jsonify({'error': 'Upload is incomplete', 'offset': session['offset']}), 409
+        if session['offset'] == 0:
+            return jsonify({'error': 'No data uploaded'}), 400
+        
+        try:
+            part_path, content_hash, probe = upload_sessions.complete(session)
+        except UnsupportedMediaError as e:
+            return jsonify({'error': str(e)}), 415
+        
+        job_id = str(uuid.uuid4())
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_{session['filename']}")
+        os.replace(part_path, file_path)
+        upload_sessions.discard(upload_id)
+    
+    return queue_job(job_id, session['filename'], file_path, content_hash, params, probe)
+
 @app.route('/api/status/<job_id>', methods=['GET'])
 def get_job_status(job_id):
-    if job_id not in jobs:
+    job = job_store.get_job(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
     
-    job = jobs[job_id].copy()
+    if job['status'] == 'queued':
+        job['queue_position'] = job_store.queue_position(job_id)
     
     # Don't return internal file paths
     if 'file_path' in job:
@@ -592,11 +1013,10 @@ def get_job_status(job_id):
 
 @app.route('/api/results/<job_id>', methods=['GET'])
 def get_job_results(job_id):
-    if job_id not in jobs:
+    job = job_store.get_job(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
     
-    job = jobs[job_id]
-    
     if job['status'] != 'complete':
         return jsonify({
             'status': job['status'],
@@ -611,6 +1031,9 @@ def get_job_results(job_id):
             'id': i + 1,
             'filename': metadata['filename'],
             'url': f"/api/download/{job_id}/{metadata['filename']}",
+            'preview_url': f"/api/download/{job_id}/{metadata['preview_filename']}" if metadata.get('preview_filename') else None,
+            'render_profile': metadata.get('render_profile'),
+            'rendered': os.path.exists(os.path.join(RESULTS_FOLDER, job_id, metadata['filename'])),
             'duration': metadata['duration'],
             'start_time': metadata['start_time'],
             'end_time': metadata['end_time']
@@ -627,26 +1050,37 @@ def get_job_results(job_id):
 @app.route('/api/download/<job_id>/<filename>', methods=['GET'])
 def download_file(job_id, filename):
     # Validate job exists
-    if job_id not in jobs:
+    job = job_store.get_job(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
     
     # Validate job is complete
-    job = jobs[job_id]
     if job['status'] != 'complete':
         return jsonify({'error': 'Job is not complete yet'}), 400
     
     # Validate filename
     file_path = os.path.join(RESULTS_FOLDER, job_id, filename)
-    print("filepath",file_path)
+    logger.debug(f"Serving {file_path}")
     if not os.path.exists(file_path):
-        return jsonify({'error': 'File not found'}), 404
+        # Highlights and their previews are rendered on first download
+        highlight = next((item for item in job.get('metadata', [])
+                          if filename in (item['filename'], item.get('preview_filename'))), None)
+        if highlight is None:
+            return jsonify({'error': 'File not found'}), 404
+        try:
+            file_path = ensure_highlight(job_id, job['file_path'], highlight,
+                                         preview=filename != highlight['filename'])
+        except Exception as e:
+            logger.error(f"Failed to render {filename} for job {job_id}: {str(e)}")
+            return jsonify({'error': f'Highlight render failed: {str(e)}'}), 500
     
-    return send_file(file_path, as_attachment=True)
+    # ?download=0 serves the clip inline, for <video> previews that seek with Range requests
+    return send_media(job_id, filename, file_path, as_attachment=request.args.get('download', '1') != '0')
 
 @app.route('/api/transcript/<job_id>', methods=['GET'])
 def get_transcript(job_id):
     # Validate job exists
-    if job_id not in jobs:
+    if job_store.get_job(job_id) is None:
         return jsonify({'error': 'Job not found'}), 404
     
     # Validate transcript exists
@@ -665,20 +1099,24 @@ def cleanup_old_jobs():
         cutoff_time = time.time() - (hours * 3600)
         
         deleted_jobs = []
-        for job_id, job in list(jobs.items()):
-            if job.get('created_at', 0) < cutoff_time:
-                # Delete job files
-                if 'file_path' in job and os.path.exists(job['file_path']):
-                    os.remove(job['file_path'])
-                
-                # Delete result folder
-                job_folder = os.path.join(RESULTS_FOLDER, job_id)
-                if os.path.exists(job_folder):
-                    shutil.rmtree(job_folder)
-                
-                # Remove job from memory
-                del jobs[job_id]
-                deleted_jobs.append(job_id)
+        for job in job_store.list_jobs(created_before=cutoff_time):
+            job_id = job['id']
+            # Never pull files out from under a running worker
+            if job['status'] == 'processing':
+                continue
+
+            # Delete job files
+            if 'file_path' in job and os.path.exists(job['file_path']):
+                os.remove(job['file_path'])
+            
+            # Delete result folder
+            job_folder = os.path.join(RESULTS_FOLDER, job_id)
+            if os.path.exists(job_folder):
+                shutil.rmtree(job_folder)
+            
+            # Remove job from the store
+            job_store.delete_job(job_id)
+            deleted_jobs.append(job_id)
         
         return jsonify({
             'message': f'Cleaned up {len(deleted_jobs)} old jobs',
@@ -692,11 +1130,26 @@ def cleanup_old_jobs():
 def health_check():
     return jsonify({
         'status': 'ok',
-        'active_jobs': len(jobs),
+        'active_jobs': job_store.count_jobs(PENDING_STATUSES),
+        'queued_jobs': job_store.count_jobs(('queued',)),
+        'workers': MAX_WORKERS,
+        'cache': result_cache.stats(),
         'version': '1.0.0'
     }), 200
 
 
+# Prometheus-style per-stage histograms (wall/CPU time, peak RSS) and I/O counters
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics_store.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+# Model registry stats of every worker (load times, cache hits, resident memory)
+@app.route('/api/models', methods=['GET'])
+def get_model_stats():
+    return jsonify(job_store.get_worker_stats()), 200
+
+
 # Route to get authenticated YouTube API service
 @app.route('/api/authenticate', methods=['GET'])
 def authenticate():
@@ -802,5 +1255,19 @@ if __name__ == '__main__':
     except Exception as e:
         logger.warning(f"Package check failed: {str(e)}")
     
+    # Resume jobs interrupted by the last shutdown, then start the worker pool
+    job_store.requeue_interrupted()
+    worker_pool = WorkerPool(
+        JOBS_DB_PATH,
+        run_job,
+        num_workers=MAX_WORKERS,
+        initializer=warm_models,
+        stats_provider=model_stats
+    )
+    worker_pool.start()
+
     # Run the Flask application
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    try:
+        app.run(host='0.0.0.0', port=5000, threaded=True)
+    finally:
+        worker_pool.stop()